@@ -1,9 +1,11 @@
 """
 Streamlit web application for healthcare provider inbox triage.
 """
+import asyncio
 import os
-import tempfile
+import time
 from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 
 import pandas as pd
 import streamlit as st
@@ -11,11 +13,164 @@ import streamlit as st
 from healthtriage.database import Database
 from healthtriage.processor import MessageProcessor
 from healthtriage.schemas import Message, TriagedMessage
-from healthtriage.triage import MessageTriager
+from healthtriage.triage import (BATCH_TERMINAL_STATUSES, MessageTriager,
+                                 SemanticCache)
 from healthtriage.utils import (create_triage_summary_chart,
                                create_triage_timeline_chart,
-                               format_datetime, get_date_range_from_messages,
-                               get_message_alert_color)
+                               format_datetime, get_message_alert_color)
+
+# Urgency level names, most urgent first
+URGENCY_NAMES = {
+    5: "IMMEDIATE",
+    4: "URGENT",
+    3: "PRIORITY",
+    2: "ROUTINE",
+    1: "LOW"
+}
+
+# Display color for each urgency level
+LEVEL_COLORS = {level: get_message_alert_color(level) for level in URGENCY_NAMES}
+
+# Urgency level color legend, rendered once at import as a single HTML element
+LEGEND_HTML = (
+    '<div style="display: flex; gap: 1rem;">'
+    + "".join(
+        f'<div style="flex: 1; background-color: {LEVEL_COLORS[level]}; color: white; '
+        f'padding: 10px; border-radius: 5px; text-align: center;">'
+        f'<strong>Level {level}</strong><br>{name}</div>'
+        for level, name in URGENCY_NAMES.items()
+    )
+    + '</div>'
+)
+
+# SQLite database file used by the app
+DB_PATH = "triage.db"
+
+# Environment variable naming the .npz file for the semantic cache; unset disables the cache
+SEMANTIC_CACHE_PATH_ENV = "SEMANTIC_CACHE_PATH"
+# Uploads larger than this are triaged through the OpenAI Batch API
+BATCH_API_THRESHOLD = 50
+# Session state key of the Batch API job waiting for results, stored as
+# {"batch_id": ..., "message_ids": [...]} so an interrupted wait can be resumed
+PENDING_BATCH_KEY = "pending_batch"
+# Minimum seconds between progress updates that don't advance the progress bar
+PROGRESS_UPDATE_INTERVAL = 0.2
+# Number of message cards shown per urgency level before "Show more" is needed
+MESSAGES_PAGE_SIZE = 50
+
+
+@st.cache_resource
+def get_db(db_path: str) -> Database:
+    """Get the database instance shared across reruns and sessions.
+    
+    st.cache_resource keys on the arguments as passed, so every caller must
+    pass the path explicitly to share one instance (and its value caches).
+    
+    Args:
+        db_path: Path to the SQLite database file
+        
+    Returns:
+        Database instance
+    """
+    return Database(db_path)
+
+
+@st.cache_resource
+def get_triager(api_key: str) -> MessageTriager:
+    """Get the message triager shared across reruns and sessions.
+    
+    Reusing the triager keeps its OpenAI client and HTTP connections alive.
+    If SEMANTIC_CACHE_PATH is set, the triager reuses results for
+    near-duplicate messages through a semantic cache stored at that path.
+    
+    Args:
+        api_key: OpenAI API key
+        
+    Returns:
+        Message triager instance
+    """
+    cache_path = os.getenv(SEMANTIC_CACHE_PATH_ENV)
+    semantic_cache = SemanticCache(path=cache_path) if cache_path else None
+    return MessageTriager(api_key=api_key, semantic_cache=semantic_cache)
+
+
+@st.cache_data(ttl=60)
+def _load_datetime_bounds(db_path: str) -> Optional[Tuple[datetime, datetime]]:
+    """Load the date range of the triaged messages, cached across reruns.
+    
+    Args:
+        db_path: Path to the SQLite database file
+        
+    Returns:
+        Tuple of (min_date, max_date), or None if there are no triaged messages
+    """
+    return get_db(db_path).get_datetime_bounds()
+
+
+@st.cache_data(ttl=60)
+def _load_triaged_count(db_path: str) -> int:
+    """Load the number of triaged messages, cached across reruns.
+    
+    Args:
+        db_path: Path to the SQLite database file
+        
+    Returns:
+        Number of triaged messages
+    """
+    return get_db(db_path).get_triaged_message_count()
+
+
+@st.cache_data(ttl=60)
+def _load_triage_categories(db_path: str) -> List[str]:
+    """Load the unique triage categories, cached across reruns.
+    
+    Args:
+        db_path: Path to the SQLite database file
+        
+    Returns:
+        List of unique triage categories
+    """
+    return get_db(db_path).get_triage_categories()
+
+
+@st.cache_data(ttl=60)
+def _load_urgency_levels(db_path: str) -> List[int]:
+    """Load the unique urgency levels, cached across reruns.
+    
+    Args:
+        db_path: Path to the SQLite database file
+        
+    Returns:
+        List of unique urgency levels
+    """
+    return get_db(db_path).get_urgency_levels()
+
+
+@st.cache_data(ttl=60)
+def _load_filtered_triaged(db_path: str,
+                           start_date: datetime,
+                           end_date: datetime,
+                           triage_category: Optional[str] = None,
+                           urgency_level: Optional[int] = None
+                           ) -> pd.DataFrame:
+    """Load filtered triaged messages as a DataFrame, cached across reruns.
+    
+    Args:
+        db_path: Path to the SQLite database file
+        start_date: Start date for filtering
+        end_date: End date for filtering
+        triage_category: Optional triage category for filtering
+        urgency_level: Optional urgency level for filtering
+        
+    Returns:
+        DataFrame with one row per filtered message
+    """
+    return get_db(db_path).get_triaged_df(
+        start_date=start_date,
+        end_date=end_date,
+        triage_category=triage_category,
+        urgency_level=urgency_level
+    )
 
 
 def main():
@@ -28,7 +183,7 @@ def main():
     )
     
     # Initialize database
-    db = Database()
+    db = get_db(DB_PATH)
     
     # Initialize the message triager
     api_key = os.getenv("OPENAI_API_KEY")
@@ -36,7 +191,7 @@ def main():
         st.error("OpenAI API key not found in environment variables. Please set the OPENAI_API_KEY environment variable.")
         st.stop()
     
-    triager = MessageTriager(api_key=api_key or "")
+    triager = get_triager(api_key)
     
     # App title and introduction
     st.title("Healthcare Provider Inbox Triage")
@@ -67,15 +222,16 @@ def show_dashboard(db: Database):
     Args:
         db: Database instance
     """
-    # Get all triaged messages
-    all_messages = db.get_all_triaged_messages()
+    # Get the number and date range of triaged messages
+    total_count = _load_triaged_count(db.db_path)
+    date_bounds = _load_datetime_bounds(db.db_path)
     
     # Debug information to help troubleshoot
     st.sidebar.subheader("Debug Information")
     st.sidebar.info(f"Database path: {db.db_path}")
-    st.sidebar.info(f"Total messages loaded: {len(all_messages)}")
+    st.sidebar.info(f"Total messages loaded: {total_count}")
     
-    if not all_messages:
+    if date_bounds is None:
         st.info("No triaged messages found. Upload messages in the 'Upload Messages' tab to get started.")
         return
     
@@ -85,7 +241,7 @@ def show_dashboard(db: Database):
     col1, col2, col3, col4 = st.columns(4)
     
     # Date range filter
-    min_date, max_date = get_date_range_from_messages(all_messages)
+    min_date, max_date = date_bounds
     with col1:
         start_date = st.date_input("From", min_date.date(), min_value=min_date.date(), max_value=max_date.date())
     with col2:
@@ -93,12 +249,12 @@ def show_dashboard(db: Database):
     
     # Triage category filter
     with col3:
-        categories = db.get_triage_categories()
+        categories = _load_triage_categories(db.db_path)
         selected_category = st.selectbox("Category", ["All"] + categories)
     
     # Urgency level filter
     with col4:
-        urgency_levels = db.get_urgency_levels()
+        urgency_levels = _load_urgency_levels(db.db_path)
         selected_urgency = st.selectbox("Urgency Level", ["All"] + [str(level) for level in urgency_levels])
     
     # Convert dates to datetime objects for filtering
@@ -117,7 +273,7 @@ def show_dashboard(db: Database):
     if selected_urgency != "All":
         filter_params["urgency_level"] = int(selected_urgency)
     
-    filtered_messages = db.get_triaged_messages_by_filter(**filter_params)
+    messages_df = _load_filtered_triaged(db.db_path, **filter_params)
     
     # Dashboard metrics
     st.subheader("Dashboard")
@@ -125,24 +281,15 @@ def show_dashboard(db: Database):
     # Message count metrics by urgency level
     st.write("Messages by Urgency Level")
     cols = st.columns(5)
-    urgency_names = {
-        5: "IMMEDIATE",
-        4: "URGENT",
-        3: "PRIORITY",
-        2: "ROUTINE", 
-        1: "LOW"
-    }
     
-    for i, (level, name) in enumerate(urgency_names.items(), start=0):
+    urgency_counts = messages_df["urgency_level"].value_counts()
+    for i, (level, name) in enumerate(URGENCY_NAMES.items(), start=0):
         with cols[i % 5]:
-            count = sum(1 for m in filtered_messages if m.urgency_level == level)
-            st.metric(f"Level {level}: {name}", count)
+            st.metric(f"Level {level}: {name}", int(urgency_counts.get(level, 0)))
     
     # Message count metrics by category
     st.write("Messages by Category")
-    category_counts = {}
-    for msg in filtered_messages:
-        category_counts[msg.triage_category] = category_counts.get(msg.triage_category, 0) + 1
+    category_counts = messages_df["triage_category"].value_counts(sort=False).to_dict()
     
     # Create columns based on number of categories
     num_categories = len(category_counts)
@@ -156,48 +303,66 @@ def show_dashboard(db: Database):
     chart1, chart2 = st.columns(2)
     
     with chart1:
-        summary_chart = create_triage_summary_chart(filtered_messages)
+        summary_chart = create_triage_summary_chart(messages_df)
         st.plotly_chart(summary_chart, use_container_width=True)
     
     with chart2:
-        timeline_chart = create_triage_timeline_chart(filtered_messages)
+        timeline_chart = create_triage_timeline_chart(messages_df)
         st.plotly_chart(timeline_chart, use_container_width=True)
     
     # Display messages
-    st.subheader(f"Messages ({len(filtered_messages)})")
+    st.subheader(f"Messages ({len(messages_df)})")
     
-    if not filtered_messages:
+    if messages_df.empty:
         st.info("No messages match the selected filters.")
         return
     
     # Group messages by urgency level for display
-    messages_by_urgency = {}
-    for level in range(5, 0, -1):  # 5 to 1 in descending order
-        level_messages = [m for m in filtered_messages if m.urgency_level == level]
-        if level_messages:
-            messages_by_urgency[level] = level_messages
+    # (rows are already ordered by urgency level, most urgent first)
+    messages_by_urgency = {
+        level: group for level, group in messages_df.groupby("urgency_level", sort=False)
+    }
     
     # Create expandable sections for each urgency level
-    for level, messages in messages_by_urgency.items():
+    for level, level_df in messages_by_urgency.items():
         # Map level to name
-        level_name = urgency_names.get(level, f"Level {level}")
+        level_name = URGENCY_NAMES.get(level, f"Level {level}")
         color = get_message_alert_color(level)
         
+        # Only render the first page of messages until more are requested
+        page_key = f"page_{level}"
+        page_size = st.session_state.setdefault(page_key, MESSAGES_PAGE_SIZE)
+        messages = level_df.head(page_size).to_dict("records")
+        
         # Create expandable section
-        with st.expander(f"Level {level}: {level_name} ({len(messages)})", expanded=(level == 5)):
-            # Display each message in this urgency level
-            for msg in messages:
-                # Create message card with custom styling
-                message_container = st.container()
-                message_container.markdown(f"""
-                <div style="border-left: 5px solid {color}; padding-left: 10px; margin-bottom: 20px;">
-                    <h4 style="margin: 0;">{msg.subject}</h4>
-                    <p style="color: gray; margin: 0;">
-                        {format_datetime(msg.datetime)} | Category: <strong>{msg.triage_category}</strong> | Confidence: {msg.confidence:.2f}
-                    </p>
-                    <p style="margin-top: 10px;">{msg.message}</p>
-                </div>
-                """, unsafe_allow_html=True)
+        with st.expander(f"Level {level}: {level_name} ({len(level_df)})", expanded=(level == 5)):
+            # Build a styled card for each message in this urgency level
+            dates = [format_datetime(msg["datetime"]) for msg in messages]
+            cards = [f"""
+            <div style="border-left: 5px solid {color}; padding-left: 10px; margin-bottom: 20px;">
+                <h4 style="margin: 0;">{msg["subject"]}</h4>
+                <p style="color: gray; margin: 0;">
+                    {date} | Category: <strong>{msg["triage_category"]}</strong> | Confidence: {msg["confidence"]:.2f}
+                </p>
+                <p style="margin-top: 10px;">{msg["message"]}</p>
+            </div>
+            """ for msg, date in zip(messages, dates)]
+            
+            # Render all cards as a single element instead of one per message
+            st.markdown("\n".join(cards), unsafe_allow_html=True)
+            
+            if len(level_df) > page_size:
+                st.button(f"Show next {MESSAGES_PAGE_SIZE}", key=f"show_more_{level}",
+                          on_click=_show_more_messages, args=(page_key,))
+
+
+def _show_more_messages(page_key: str) -> None:
+    """Show another page of messages in an urgency level section.
+    
+    Args:
+        page_key: Session state key holding the section's page size
+    """
+    st.session_state[page_key] += MESSAGES_PAGE_SIZE
 
 
 def upload_messages(db: Database, triager: MessageTriager):
@@ -210,27 +375,32 @@ def upload_messages(db: Database, triager: MessageTriager):
     st.subheader("Upload Messages")
     st.markdown("Upload a CSV file containing inbox messages to triage. The CSV should have the following columns: `message_id`, `subject`, `message`, `datetime`.")
     
+    # A batch job submitted earlier in this session is resumed rather than
+    # letting the same messages be submitted (and paid for) again
+    if PENDING_BATCH_KEY in st.session_state:
+        check_pending_batch(db, triager)
+        return
+    
     uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
     
     if uploaded_file:
         try:
-            # Save to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-                tmp_file.write(uploaded_file.getvalue())
-                tmp_path = tmp_file.name
-            
-            # Process the CSV file
-            processor = MessageProcessor()
-            messages = processor.load_messages_from_csv(tmp_path)
-            
-            # Clean up the temporary file
-            os.unlink(tmp_path)
+            # The uploader keeps its file across reruns, so each upload is only
+            # loaded (and the query planner statistics refreshed) once
+            if st.session_state.get("loaded_upload_id") != uploaded_file.file_id:
+                # Process the CSV file in chunks, inserting each into the database
+                processor = MessageProcessor()
+                uploaded_file.seek(0)
+                message_count = 0
+                for messages in processor.iter_messages_from_csv(uploaded_file):
+                    db.insert_messages(messages)
+                    message_count += len(messages)
+                db.analyze()
+                st.session_state.loaded_upload_id = uploaded_file.file_id
+                st.session_state.loaded_message_count = message_count
             
             # Display message count
-            st.success(f"Successfully loaded {len(messages)} messages from CSV.")
-            
-            # Insert messages into the database
-            db.insert_messages(messages)
+            st.success(f"Successfully loaded {st.session_state.loaded_message_count} messages from CSV.")
             
             # Get untriaged messages
             untriaged_messages = db.get_untriaged_messages()
@@ -246,20 +416,36 @@ def upload_messages(db: Database, triager: MessageTriager):
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                # Process messages in batches to show progress
                 total_messages = len(untriaged_messages)
                 
-                for i, message in enumerate(untriaged_messages):
-                    # Update progress
-                    progress = int((i / total_messages) * 100)
-                    progress_bar.progress(progress)
-                    status_text.text(f"Processing message {i+1} of {total_messages}...")
+                if total_messages > BATCH_API_THRESHOLD:
+                    # Large uploads go through the cheaper, higher-throughput Batch API
+                    triaged_messages = run_batch_api_triage(
+                        triager, untriaged_messages, progress_bar, status_text
+                    )
+                else:
+                    last_progress = 0
+                    last_update = time.monotonic()
                     
-                    # Triage message
-                    triaged_message = triager.triage_message(message)
+                    def on_result(done: int, total: int, triaged_message: TriagedMessage):
+                        # Update progress as messages complete, throttled because every
+                        # update is a round-trip to the browser
+                        nonlocal last_progress, last_update
+                        progress = int((done / total) * 100)
+                        now = time.monotonic()
+                        if progress - last_progress >= 1 or now - last_update > PROGRESS_UPDATE_INTERVAL:
+                            progress_bar.progress(progress)
+                            status_text.text(f"Processed message {done} of {total}...")
+                            last_progress = progress
+                            last_update = now
                     
-                    # Insert into database
-                    db.insert_triaged_message(triaged_message)
+                    # Triage messages concurrently
+                    triaged_messages = asyncio.run(
+                        triager.batch_triage(untriaged_messages, on_result=on_result)
+                    )
+                
+                save_triaged_messages(db, triaged_messages)
+                st.session_state.pop(PENDING_BATCH_KEY, None)
                 
                 # Complete progress
                 progress_bar.progress(100)
@@ -273,6 +459,122 @@ def upload_messages(db: Database, triager: MessageTriager):
             st.error(f"Error processing CSV file: {str(e)}")
 
 
+def save_triaged_messages(db: Database, triaged_messages: List[TriagedMessage]):
+    """Store triage results and refresh the cached dashboard data.
+    
+    Args:
+        db: Database instance
+        triaged_messages: Triaged messages to store
+    """
+    # Insert all results into the database in a single transaction
+    db.insert_triaged_messages(triaged_messages)
+    db.analyze()
+    
+    # Invalidate cached dashboard data so the new triage results show up
+    _load_triaged_count.clear()
+    _load_datetime_bounds.clear()
+    _load_triage_categories.clear()
+    _load_urgency_levels.clear()
+    _load_filtered_triaged.clear()
+
+
+def batch_status_text(batch) -> str:
+    """Describe the progress of a Batch API job.
+    
+    Args:
+        batch: OpenAI Batch object
+        
+    Returns:
+        Status text for display
+    """
+    counts = batch.request_counts
+    if counts and counts.total:
+        return f"Batch job {batch.status}: {counts.completed} of {counts.total} messages processed..."
+    return f"Batch job {batch.status}..."
+
+
+def check_pending_batch(db: Database, triager: MessageTriager):
+    """Show the status of the pending Batch API job and save its results once done.
+    
+    Args:
+        db: Database instance
+        triager: Message triager instance
+    """
+    pending = st.session_state[PENDING_BATCH_KEY]
+    batch_id = pending["batch_id"]
+    try:
+        batch = triager.retrieve_batch(batch_id)
+        
+        if batch.status not in BATCH_TERMINAL_STATUSES:
+            counts = batch.request_counts
+            if counts and counts.total:
+                st.progress(int((counts.completed / counts.total) * 100))
+            st.info(f"{batch_status_text(batch)} Results are saved once job {batch_id} completes.")
+            st.button("Refresh Batch Status")
+            return
+        
+        if batch.status != "completed":
+            del st.session_state[PENDING_BATCH_KEY]
+            st.error(f"Batch job {batch_id} ended with status '{batch.status}'. Triage the messages again to retry.")
+            return
+        
+        # Messages triaged some other way in the meantime are left as they are
+        message_ids = set(pending["message_ids"])
+        messages = [m for m in db.get_untriaged_messages() if m.message_id in message_ids]
+        try:
+            triaged_messages = triager.parse_batch_results(batch, messages)
+        except RuntimeError as e:
+            del st.session_state[PENDING_BATCH_KEY]
+            st.error(f"{str(e)}. Triage the messages again to retry.")
+            return
+        save_triaged_messages(db, triaged_messages)
+        del st.session_state[PENDING_BATCH_KEY]
+        
+        st.success(f"Successfully triaged {len(triaged_messages)} messages.")
+        st.rerun()
+    
+    except Exception as e:
+        st.error(f"Error checking batch job {batch_id}: {str(e)}")
+
+
+def run_batch_api_triage(triager: MessageTriager, messages: List[Message],
+                         progress_bar, status_text) -> List[TriagedMessage]:
+    """Triage messages through the OpenAI Batch API and wait for the results.
+    
+    The job is recorded in session state as soon as it is submitted, so if
+    the wait is interrupted (e.g. by a widget interaction) the next rerun
+    resumes it through check_pending_batch instead of submitting again.
+    
+    Args:
+        triager: Message triager instance
+        messages: List of messages to triage
+        progress_bar: Streamlit progress bar to update while polling
+        status_text: Streamlit placeholder for status updates
+        
+    Returns:
+        List of triaged messages
+    """
+    batch_id = triager.submit_batch(messages)
+    st.session_state[PENDING_BATCH_KEY] = {
+        "batch_id": batch_id,
+        "message_ids": [message.message_id for message in messages],
+    }
+    status_text.text(f"Submitted batch job {batch_id} for {len(messages)} messages...")
+    
+    def on_poll(batch):
+        counts = batch.request_counts
+        if counts and counts.total:
+            progress_bar.progress(int((counts.completed / counts.total) * 100))
+        status_text.text(batch_status_text(batch))
+    
+    try:
+        return triager.wait_for_batch(batch_id, messages, on_poll=on_poll)
+    except RuntimeError:
+        # The job failed, expired or was cancelled, so there is nothing to resume
+        del st.session_state[PENDING_BATCH_KEY]
+        raise
+
+
 def show_triage_info(triager: MessageTriager):
     """Show information about the triage classification system.
     
@@ -288,23 +590,7 @@ def show_triage_info(triager: MessageTriager):
     # Display urgency level colors
     st.subheader("Urgency Level Colors")
     
-    cols = st.columns(5)
-    
-    urgency_data = [
-        {"level": 5, "name": "IMMEDIATE", "color": "#e74c3c"},
-        {"level": 4, "name": "URGENT", "color": "#f39c12"},
-        {"level": 3, "name": "PRIORITY", "color": "#3498db"},
-        {"level": 2, "name": "ROUTINE", "color": "#2ecc71"},
-        {"level": 1, "name": "LOW", "color": "#95a5a6"}
-    ]
-    
-    for i, data in enumerate(urgency_data):
-        with cols[i]:
-            st.markdown(f"""
-            <div style="background-color: {data['color']}; color: white; padding: 10px; border-radius: 5px; text-align: center;">
-                <strong>Level {data['level']}</strong><br>{data['name']}
-            </div>
-            """, unsafe_allow_html=True)
+    st.markdown(LEGEND_HTML, unsafe_allow_html=True)
 
 
 if __name__ == "__main__":
@@ -3,11 +3,202 @@ Database operations for the HealthTriage application.
 """
 import os
 import sqlite3
-from datetime import datetime
-from typing import List, Optional
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from itertools import product, repeat
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
 
 from healthtriage.schemas import Message, TriagedMessage
 
+# Connection settings applied once when the connection is opened:
+# WAL journaling with NORMAL sync avoids an fsync on every commit, and a larger
+# page cache, memory-mapped I/O and in-memory temp storage keep hot pages in RAM
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",  # 64 MB
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA foreign_keys=ON",
+)
+
+# Maximum number of rows passed to a single executemany call in bulk inserts
+INSERT_BATCH_SIZE = 500
+
+# Datetimes are stored as INTEGER milliseconds since the Unix epoch. Naive
+# datetimes are treated as UTC wall-clock time, matching pd.to_datetime(unit="ms")
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+# Number of rows fetched per round-trip when streaming query results
+FETCH_BATCH_SIZE = 1000
+
+# Lightweight read-only row for display paths; datetime and processed_at are
+# left as stored, in milliseconds since the Unix epoch
+TriagedRow = namedtuple("TriagedRow", [
+    "message_id", "subject", "message", "datetime",
+    "triage_category", "urgency_level", "confidence", "processed_at",
+])
+
+# Size of the connection's prepared statement cache, keyed by SQL text
+CACHED_STATEMENTS = 256
+
+# Table definitions; the table name is a placeholder so the datetime migration
+# can build replacement tables with the same schema
+CREATE_MESSAGES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    message_id TEXT PRIMARY KEY,
+    subject TEXT NOT NULL,
+    message TEXT NOT NULL,
+    datetime INTEGER NOT NULL
+)
+"""
+CREATE_TRIAGED_MESSAGES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    message_id TEXT PRIMARY KEY,
+    triage_category TEXT NOT NULL,
+    urgency_level INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    processed_at INTEGER NOT NULL,
+    FOREIGN KEY (message_id) REFERENCES messages (message_id)
+)
+"""
+
+# Write statements are kept as constants so every call reuses the same SQL
+# text and hits the connection's statement cache instead of re-preparing
+INSERT_MESSAGE_SQL = (
+    "INSERT OR REPLACE INTO messages (message_id, subject, message, datetime) "
+    "VALUES (?, ?, ?, ?)"
+)
+INSERT_MESSAGE_IF_MISSING_SQL = (
+    "INSERT INTO messages (message_id, subject, message, datetime) "
+    "VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (message_id) DO NOTHING"
+)
+# Upsert rather than INSERT OR REPLACE, so an existing row is updated in place
+# instead of being deleted and re-inserted along with its index entries
+INSERT_TRIAGED_MESSAGE_SQL = (
+    "INSERT INTO triaged_messages "
+    "(message_id, triage_category, urgency_level, confidence, processed_at) "
+    "VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (message_id) DO UPDATE SET "
+    "triage_category = excluded.triage_category, "
+    "urgency_level = excluded.urgency_level, "
+    "confidence = excluded.confidence, "
+    "processed_at = excluded.processed_at"
+)
+
+# Conditions for each optional filter on triaged messages, in the order of the
+# flags that key FILTER_QUERIES: start date, end date, category, urgency level
+FILTER_CONDITIONS = (
+    "m.datetime >= ?",
+    "m.datetime <= ?",
+    "t.triage_category = ?",
+    "t.urgency_level = ?",
+)
+
+
+def _build_filter_queries() -> Dict[Tuple[bool, ...], str]:
+    """Build the triaged message query for every combination of filters.
+    
+    Each combination gets its own fixed SQL text, so repeated queries hit the
+    statement cache, and each keeps plain column comparisons that can use
+    the indexes.
+    
+    Returns:
+        Dict mapping a tuple of "filter is set" flags to the SQL query
+    """
+    queries = {}
+    for flags in product((False, True), repeat=len(FILTER_CONDITIONS)):
+        conditions = [condition for condition, is_set in zip(FILTER_CONDITIONS, flags) if is_set]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        queries[flags] = f"""
+        SELECT m.message_id, m.subject, m.message, m.datetime, 
+               t.triage_category, t.urgency_level, t.confidence, t.processed_at
+        FROM messages m
+        JOIN triaged_messages t ON m.message_id = t.message_id
+        {where}
+        ORDER BY t.urgency_level DESC, m.datetime DESC
+        LIMIT ? OFFSET ?
+        """
+    return queries
+
+
+FILTER_QUERIES = _build_filter_queries()
+
+
+def _to_epoch_ms(value: datetime) -> int:
+    """Convert a datetime to milliseconds since the Unix epoch.
+    
+    Args:
+        value: The datetime to convert; timezone-aware values are converted to UTC
+        
+    Returns:
+        Milliseconds since the epoch
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MILLISECOND
+
+
+def _from_epoch_ms(value: int) -> datetime:
+    """Convert milliseconds since the Unix epoch to a naive datetime.
+    
+    Args:
+        value: Milliseconds since the epoch
+        
+    Returns:
+        The corresponding datetime
+    """
+    return _EPOCH + timedelta(milliseconds=value)
+
+
+def _iso_to_epoch_ms(value: str) -> int:
+    """Convert a stored ISO 8601 string to milliseconds since the Unix epoch."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        parsed = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
+    return _to_epoch_ms(parsed)
+
+
+def _to_message_row(message: Message) -> tuple:
+    """Build the messages table row for a message."""
+    return (message.message_id, message.subject, message.message, _to_epoch_ms(message.datetime))
+
+
+def _to_triage_row(triaged_message: TriagedMessage, default_processed_at: int) -> tuple:
+    """Build the triaged_messages table row for a triaged message.
+    
+    Args:
+        triaged_message: The triaged message
+        default_processed_at: Epoch milliseconds to use if processed_at is not set
+        
+    Returns:
+        Row tuple matching INSERT_TRIAGED_MESSAGE_SQL
+    """
+    processed_at = triaged_message.processed_at
+    return (triaged_message.message_id, triaged_message.triage_category,
+            triaged_message.urgency_level, triaged_message.confidence,
+            _to_epoch_ms(processed_at) if processed_at else default_processed_at)
+
+
+def _row_to_message(row: sqlite3.Row) -> Message:
+    """Build a Message from a (message_id, subject, message, datetime) row."""
+    message_id, subject, message, message_datetime = row
+    return Message(message_id, subject, message, _from_epoch_ms(message_datetime))
+
+
+def _row_to_triaged_message(row: sqlite3.Row) -> TriagedMessage:
+    """Build a TriagedMessage from a row of the triaged message query."""
+    (message_id, subject, message, message_datetime,
+     triage_category, urgency_level, confidence, processed_at) = row
+    return TriagedMessage(message_id, subject, message, _from_epoch_ms(message_datetime),
+                          triage_category, urgency_level, confidence, _from_epoch_ms(processed_at))
+
 
 class Database:
     """Handle all database operations for the HealthTriage application."""
@@ -15,50 +206,117 @@ class Database:
     def __init__(self, db_path: str = "triage.db"):
         """Initialize the database connection.
         
+        A single connection is opened here and reused by every method. The
+        instance may be shared between threads (e.g. Streamlit sessions), so
+        all access to the connection goes through a lock.
+        
         Args:
             db_path: Path to the SQLite database file
         """
         self.db_path = db_path
-        
-        # Create the tables if they don't exist
-        # (SQLite will create the database file if it doesn't exist)
+        self._lock = threading.RLock()
+        
+        # The distinct categories and urgency levels change only when triaged
+        # messages are written, so they are cached until the next such write
+        self._categories_cache: Optional[List[str]] = None
+        self._urgency_levels_cache: Optional[List[int]] = None
+        
+        # SQLite will create the database file if it doesn't exist
+        self._conn = sqlite3.connect(db_path, check_same_thread=False,
+                                     cached_statements=CACHED_STATEMENTS)
+        self._conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            self._conn.execute(pragma)
+        
+        # Convert databases created with TEXT datetimes, then create the tables
+        # if they don't exist
+        self._migrate_datetime_columns()
         self._create_tables()
     
-    def _get_connection(self) -> sqlite3.Connection:
-        """Get a connection to the database."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def __del__(self):
+        """Close the database connection when the instance is garbage collected."""
+        if getattr(self, "_conn", None) is not None:
+            self._conn.close()
     
     def _create_tables(self) -> None:
         """Create the necessary tables if they don't exist."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # Create messages table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            message_id TEXT PRIMARY KEY,
-            subject TEXT NOT NULL,
-            message TEXT NOT NULL,
-            datetime TEXT NOT NULL
-        )
-        ''')
-        
-        # Create triaged_messages table with separated urgency_level and category
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS triaged_messages (
-            message_id TEXT PRIMARY KEY,
-            triage_category TEXT NOT NULL,
-            urgency_level INTEGER NOT NULL,
-            confidence REAL NOT NULL,
-            processed_at TEXT NOT NULL,
-            FOREIGN KEY (message_id) REFERENCES messages (message_id)
-        )
-        ''')
+        with self._lock, self._conn:
+            # Create messages table
+            self._conn.execute(CREATE_MESSAGES_TABLE_SQL.format(table="messages"))
+        
+            # Create triaged_messages table with separated urgency_level and category
+            self._conn.execute(CREATE_TRIAGED_MESSAGES_TABLE_SQL.format(table="triaged_messages"))
+        
+            # Create indexes on the columns used to filter and sort triaged messages
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_datetime ON messages (datetime DESC)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_triaged_category ON triaged_messages (triage_category)")
+        
+            # Covering index so urgency-ordered reads of the triage columns never
+            # touch the triaged_messages table itself. It also serves every
+            # lookup by urgency_level, which makes the older single-column
+            # urgency index redundant
+            self._conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_triaged_cover ON triaged_messages
+                (urgency_level DESC, triage_category, message_id, confidence, processed_at)
+            """)
+            self._conn.execute("DROP INDEX IF EXISTS idx_triaged_urgency")
+    
+    def _migrate_datetime_columns(self) -> None:
+        """Convert tables that store datetimes as ISO 8601 TEXT to epoch milliseconds.
+        
+        SQLite cannot change a column type in place, so each table is rebuilt
+        under its new schema and the old one dropped, in a single transaction.
+        Databases that are new or already converted are left untouched.
+        """
+        with self._lock:
+            columns = {row['name']: row['type'] for row in self._conn.execute("PRAGMA table_info(messages)")}
+            if columns.get('datetime') != 'TEXT':
+                return
+        
+            # Foreign keys must be off while the referenced table is replaced,
+            # and the pragma cannot be changed inside a transaction
+            self._conn.execute("PRAGMA foreign_keys=OFF")
+            self._conn.create_function("iso_to_epoch_ms", 1, _iso_to_epoch_ms, deterministic=True)
+            try:
+                with self._conn:
+                    self._conn.execute("BEGIN")
+                    self._conn.execute(CREATE_MESSAGES_TABLE_SQL.format(table="messages_new"))
+                    self._conn.execute("""
+                    INSERT INTO messages_new (message_id, subject, message, datetime)
+                    SELECT message_id, subject, message, iso_to_epoch_ms(datetime) FROM messages
+                    """)
+                    self._conn.execute(CREATE_TRIAGED_MESSAGES_TABLE_SQL.format(table="triaged_messages_new"))
+                    self._conn.execute("""
+                    INSERT INTO triaged_messages_new
+                        (message_id, triage_category, urgency_level, confidence, processed_at)
+                    SELECT message_id, triage_category, urgency_level, confidence, iso_to_epoch_ms(processed_at)
+                    FROM triaged_messages
+                    """)
+                    
+                    # Dropping the old tables also drops their indexes, which
+                    # _create_tables then rebuilds on the new ones
+                    self._conn.execute("DROP TABLE triaged_messages")
+                    self._conn.execute("DROP TABLE messages")
+                    self._conn.execute("ALTER TABLE messages_new RENAME TO messages")
+                    self._conn.execute("ALTER TABLE triaged_messages_new RENAME TO triaged_messages")
+            finally:
+                self._conn.execute("PRAGMA foreign_keys=ON")
+    
+    def analyze(self) -> None:
+        """Refresh the query planner statistics.
         
-        conn.commit()
-        conn.close()
+        Should be called once after a bulk load so the planner picks the
+        filter indexes based on the actual data.
+        """
+        with self._lock:
+            self._conn.execute("ANALYZE")
     
     def insert_message(self, message: Message) -> None:
         """Insert a message into the database.
@@ -66,34 +324,22 @@ class Database:
         Args:
             message: The message to insert
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "INSERT OR REPLACE INTO messages (message_id, subject, message, datetime) VALUES (?, ?, ?, ?)",
-            (message.message_id, message.subject, message.message, message.datetime.isoformat())
-        )
-        
-        conn.commit()
-        conn.close()
+        with self._lock, self._conn:
+            self._conn.execute(INSERT_MESSAGE_SQL, _to_message_row(message))
     
     def insert_messages(self, messages: List[Message]) -> None:
-        """Insert multiple messages into the database.
+        """Insert multiple messages into the database in one transaction.
         
         Args:
             messages: List of messages to insert
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        # Build all rows up front so SQLite iterates a plain list
+        rows = list(map(_to_message_row, messages))
         
-        for message in messages:
-            cursor.execute(
-                "INSERT OR REPLACE INTO messages (message_id, subject, message, datetime) VALUES (?, ?, ?, ?)",
-                (message.message_id, message.subject, message.message, message.datetime.isoformat())
-            )
-        
-        conn.commit()
-        conn.close()
+        with self._lock, self._conn:
+            # One prepared statement and one commit for all rows, sent in batches
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                self._conn.executemany(INSERT_MESSAGE_SQL, rows[start:start + INSERT_BATCH_SIZE])
     
     def insert_triaged_message(self, triaged_message: TriagedMessage) -> None:
         """Insert a triaged message into the database.
@@ -101,88 +347,66 @@ class Database:
         Args:
             triaged_message: The triaged message to insert
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # First, insert the message if it doesn't exist
-        cursor.execute(
-            "INSERT OR IGNORE INTO messages (message_id, subject, message, datetime) VALUES (?, ?, ?, ?)",
-            (triaged_message.message_id, triaged_message.subject, triaged_message.message, 
-             triaged_message.datetime.isoformat())
-        )
+        now = _to_epoch_ms(datetime.now())
         
-        # Then insert the triage information
-        processed_at = triaged_message.processed_at or datetime.now()
-        cursor.execute(
-            """INSERT OR REPLACE INTO triaged_messages 
-               (message_id, triage_category, urgency_level, confidence, processed_at) 
-               VALUES (?, ?, ?, ?, ?)""",
-            (triaged_message.message_id, triaged_message.triage_category, 
-             triaged_message.urgency_level, triaged_message.confidence, processed_at.isoformat())
-        )
+        with self._lock, self._conn:
+            # First, insert the message if it doesn't exist
+            self._conn.execute(INSERT_MESSAGE_IF_MISSING_SQL, _to_message_row(triaged_message))
         
-        conn.commit()
-        conn.close()
+            # Then insert the triage information
+            self._conn.execute(INSERT_TRIAGED_MESSAGE_SQL, _to_triage_row(triaged_message, now))
+            self._invalidate_value_caches()
     
-    def get_all_triaged_messages(self) -> List[TriagedMessage]:
+    def insert_triaged_messages(self, triaged_messages: List[TriagedMessage]) -> None:
+        """Insert multiple triaged messages into the database in one transaction.
+        
+        Args:
+            triaged_messages: List of triaged messages to insert
+        """
+        # Build all rows up front so SQLite iterates plain lists
+        now = _to_epoch_ms(datetime.now())
+        message_rows = list(map(_to_message_row, triaged_messages))
+        triage_rows = list(map(_to_triage_row, triaged_messages, repeat(now)))
+        
+        with self._lock, self._conn:
+            for start in range(0, len(message_rows), INSERT_BATCH_SIZE):
+                end = start + INSERT_BATCH_SIZE
+                
+                # First, insert the messages that don't exist
+                self._conn.executemany(INSERT_MESSAGE_IF_MISSING_SQL, message_rows[start:end])
+                
+                # Then insert the triage information
+                self._conn.executemany(INSERT_TRIAGED_MESSAGE_SQL, triage_rows[start:end])
+        
+            self._invalidate_value_caches()
+    
+    def get_all_triaged_messages(self,
+                                 limit: Optional[int] = None,
+                                 offset: int = 0) -> List[TriagedMessage]:
         """Get all triaged messages from the database.
         
+        Args:
+            limit: Optional maximum number of messages to return
+            offset: Number of messages to skip, for paging through results
+            
         Returns:
-            List of triaged messages
+            List of triaged messages, ordered by urgency level and date
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        query, params = self._build_filter_query(limit=limit, offset=offset)
         
-        cursor.execute("""
-        SELECT m.message_id, m.subject, m.message, m.datetime, 
-               t.triage_category, t.urgency_level, t.confidence, t.processed_at
-        FROM messages m
-        JOIN triaged_messages t ON m.message_id = t.message_id
-        ORDER BY t.urgency_level DESC, m.datetime DESC
-        """)
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            triaged_messages = [_row_to_triaged_message(row) for row in cursor]
         
-        results = cursor.fetchall()
-        triaged_messages = []
-        
-        for row in results:
-            try:
-                # Handle potential datetime parsing issues
-                try:
-                    msg_datetime = datetime.fromisoformat(row['datetime'])
-                except ValueError:
-                    # Try to handle different date formats
-                    msg_datetime = datetime.strptime(row['datetime'], "%Y-%m-%dT%H:%M:%S")
-                
-                try:
-                    processed_at = datetime.fromisoformat(row['processed_at'])
-                except ValueError:
-                    # Try to handle different date formats
-                    processed_at = datetime.strptime(row['processed_at'], "%Y-%m-%dT%H:%M:%S")
-                
-                triaged_message = TriagedMessage(
-                    message_id=row['message_id'],
-                    subject=row['subject'],
-                    message=row['message'],
-                    datetime=msg_datetime,
-                    triage_category=row['triage_category'],
-                    urgency_level=row['urgency_level'],
-                    confidence=row['confidence'],
-                    processed_at=processed_at
-                )
-                triaged_messages.append(triaged_message)
-            except Exception as e:
-                print(f"Error processing message {row['message_id']}: {e}")
-                # Continue with other messages even if one fails
-                continue
-        
-        conn.close()
         return triaged_messages
     
     def get_triaged_messages_by_filter(self, 
                                      start_date: Optional[datetime] = None,
                                      end_date: Optional[datetime] = None,
                                      triage_category: Optional[str] = None,
-                                     urgency_level: Optional[int] = None) -> List[TriagedMessage]:
+                                     urgency_level: Optional[int] = None,
+                                     limit: Optional[int] = None,
+                                     offset: int = 0) -> List[TriagedMessage]:
         """Get triaged messages filtered by criteria.
         
         Args:
@@ -190,77 +414,161 @@ class Database:
             end_date: Optional end date for filtering
             triage_category: Optional triage category for filtering
             urgency_level: Optional urgency level for filtering
+            limit: Optional maximum number of messages to return
+            offset: Number of messages to skip, for paging through results
             
         Returns:
             List of filtered triaged messages
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        query, params = self._build_filter_query(start_date, end_date, triage_category, urgency_level,
+                                                 limit, offset)
         
-        query = """
-        SELECT m.message_id, m.subject, m.message, m.datetime, 
-               t.triage_category, t.urgency_level, t.confidence, t.processed_at
-        FROM messages m
-        JOIN triaged_messages t ON m.message_id = t.message_id
-        WHERE 1=1
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            triaged_messages = [_row_to_triaged_message(row) for row in cursor]
+        
+        return triaged_messages
+    
+    def iter_triaged_rows(self,
+                          start_date: Optional[datetime] = None,
+                          end_date: Optional[datetime] = None,
+                          triage_category: Optional[str] = None,
+                          urgency_level: Optional[int] = None) -> Iterator[TriagedRow]:
+        """Stream triaged messages filtered by criteria as lightweight rows.
+        
+        Rows are fetched in batches of FETCH_BATCH_SIZE, so the full result
+        is never held in memory, and no TriagedMessage or datetime objects
+        are built. The lock is held only while each batch is fetched.
+        
+        Args:
+            start_date: Optional start date for filtering
+            end_date: Optional end date for filtering
+            triage_category: Optional triage category for filtering
+            urgency_level: Optional urgency level for filtering
+            
+        Yields:
+            TriagedRow tuples, ordered by urgency level and date
+        """
+        query, params = self._build_filter_query(start_date, end_date, triage_category, urgency_level)
+        
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.row_factory = lambda _, row: TriagedRow._make(row)
+            cursor.arraysize = FETCH_BATCH_SIZE
+            cursor.execute(query, params)
+        
+        try:
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+    
+    def get_triaged_df(self,
+                       start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None,
+                       triage_category: Optional[str] = None,
+                       urgency_level: Optional[int] = None) -> pd.DataFrame:
+        """Get triaged messages filtered by criteria as a DataFrame.
+        
+        Rows are read straight into columns, without building a
+        TriagedMessage per row, and the epoch-millisecond datetime columns
+        are converted in one vectorized step.
+        
+        Args:
+            start_date: Optional start date for filtering
+            end_date: Optional end date for filtering
+            triage_category: Optional triage category for filtering
+            urgency_level: Optional urgency level for filtering
+            
+        Returns:
+            DataFrame with one row per triaged message, ordered by urgency
+            level and date (most urgent and most recent first)
         """
-        params = []
+        query, params = self._build_filter_query(start_date, end_date, triage_category, urgency_level)
         
-        if start_date:
-            query += " AND m.datetime >= ?"
-            params.append(start_date.isoformat())
+        with self._lock:
+            df = pd.read_sql_query(
+                query, self._conn, params=params,
+                parse_dates={"datetime": {"unit": "ms"}, "processed_at": {"unit": "ms"}}
+            )
         
-        if end_date:
-            query += " AND m.datetime <= ?"
-            params.append(end_date.isoformat())
+        return df
+    
+    def _build_filter_query(self,
+                            start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None,
+                            triage_category: Optional[str] = None,
+                            urgency_level: Optional[int] = None,
+                            limit: Optional[int] = None,
+                            offset: int = 0) -> Tuple[str, list]:
+        """Build the query for triaged messages filtered by criteria.
         
-        if triage_category:
-            query += " AND t.triage_category = ?"
-            params.append(triage_category)
+        Args:
+            start_date: Optional start date for filtering
+            end_date: Optional end date for filtering
+            triage_category: Optional triage category for filtering
+            urgency_level: Optional urgency level for filtering
+            limit: Optional maximum number of rows to return
+            offset: Number of rows to skip
+            
+        Returns:
+            Tuple of (SQL query, query parameters)
+        """
+        filters = (
+            _to_epoch_ms(start_date) if start_date else None,
+            _to_epoch_ms(end_date) if end_date else None,
+            triage_category or None,
+            urgency_level,
+        )
+        query = FILTER_QUERIES[tuple(value is not None for value in filters)]
+        params = [value for value in filters if value is not None]
         
-        if urgency_level is not None:
-            query += " AND t.urgency_level = ?"
-            params.append(urgency_level)
+        # Let SQLite stop after the requested page; a negative LIMIT means no limit
+        params.extend([-1 if limit is None else limit, offset])
         
-        query += " ORDER BY t.urgency_level DESC, m.datetime DESC"
+        return query, params
+    
+    def get_datetime_bounds(self) -> Optional[Tuple[datetime, datetime]]:
+        """Get the earliest and latest datetimes of the triaged messages.
         
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        triaged_messages = []
+        Each bound walks the datetime index from one end and stops at the
+        first triaged message, so no rows are loaded.
         
-        for row in results:
-            try:
-                # Handle potential datetime parsing issues
-                try:
-                    msg_datetime = datetime.fromisoformat(row['datetime'])
-                except ValueError:
-                    # Try to handle different date formats
-                    msg_datetime = datetime.strptime(row['datetime'], "%Y-%m-%dT%H:%M:%S")
-                
-                try:
-                    processed_at = datetime.fromisoformat(row['processed_at'])
-                except ValueError:
-                    # Try to handle different date formats
-                    processed_at = datetime.strptime(row['processed_at'], "%Y-%m-%dT%H:%M:%S")
-                
-                triaged_message = TriagedMessage(
-                    message_id=row['message_id'],
-                    subject=row['subject'],
-                    message=row['message'],
-                    datetime=msg_datetime,
-                    triage_category=row['triage_category'],
-                    urgency_level=row['urgency_level'],
-                    confidence=row['confidence'],
-                    processed_at=processed_at
-                )
-                triaged_messages.append(triaged_message)
-            except Exception as e:
-                print(f"Error processing filtered message {row['message_id']}: {e}")
-                # Continue with other messages even if one fails
-                continue
-        
-        conn.close()
-        return triaged_messages
+        Returns:
+            Tuple of (min_date, max_date), or None if there are no triaged messages
+        """
+        with self._lock:
+            cursor = self._conn.execute("""
+            SELECT
+                (SELECT m.datetime FROM messages m
+                 JOIN triaged_messages t ON m.message_id = t.message_id
+                 ORDER BY m.datetime ASC LIMIT 1) AS min_datetime,
+                (SELECT m.datetime FROM messages m
+                 JOIN triaged_messages t ON m.message_id = t.message_id
+                 ORDER BY m.datetime DESC LIMIT 1) AS max_datetime
+            """)
+            row = cursor.fetchone()
+        
+        if row['min_datetime'] is None:
+            return None
+        
+        return _from_epoch_ms(row['min_datetime']), _from_epoch_ms(row['max_datetime'])
+    
+    def get_triaged_message_count(self) -> int:
+        """Get the number of triaged messages.
+        
+        Returns:
+            Number of triaged messages
+        """
+        with self._lock:
+            cursor = self._conn.execute("SELECT COUNT(*) FROM triaged_messages")
+            count = cursor.fetchone()[0]
+        
+        return count
     
     def get_untriaged_messages(self) -> List[Message]:
         """Get messages that haven't been triaged yet.
@@ -268,41 +576,15 @@ class Database:
         Returns:
             List of untriaged messages
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-        SELECT m.message_id, m.subject, m.message, m.datetime
-        FROM messages m
-        LEFT JOIN triaged_messages t ON m.message_id = t.message_id
-        WHERE t.message_id IS NULL
-        """)
+        with self._lock:
+            cursor = self._conn.execute("""
+            SELECT m.message_id, m.subject, m.message, m.datetime
+            FROM messages m
+            LEFT JOIN triaged_messages t ON m.message_id = t.message_id
+            WHERE t.message_id IS NULL
+            """)
+            messages = [_row_to_message(row) for row in cursor]
         
-        results = cursor.fetchall()
-        messages = []
-        
-        for row in results:
-            try:
-                # Handle potential datetime parsing issues
-                try:
-                    msg_datetime = datetime.fromisoformat(row['datetime'])
-                except ValueError:
-                    # Try to handle different date formats
-                    msg_datetime = datetime.strptime(row['datetime'], "%Y-%m-%dT%H:%M:%S")
-                
-                message = Message(
-                    message_id=row['message_id'],
-                    subject=row['subject'],
-                    message=row['message'],
-                    datetime=msg_datetime
-                )
-                messages.append(message)
-            except Exception as e:
-                print(f"Error processing untriaged message {row['message_id']}: {e}")
-                # Continue with other messages even if one fails
-                continue
-        
-        conn.close()
         return messages
     
     def get_triage_categories(self) -> List[str]:
@@ -311,14 +593,11 @@ class Database:
         Returns:
             List of unique triage categories
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT DISTINCT triage_category FROM triaged_messages")
-        results = cursor.fetchall()
-        
-        categories = [row['triage_category'] for row in results]
-        conn.close()
+        with self._lock:
+            if self._categories_cache is None:
+                cursor = self._conn.execute("SELECT DISTINCT triage_category FROM triaged_messages")
+                self._categories_cache = [row['triage_category'] for row in cursor]
+            categories = list(self._categories_cache)
         
         return categories
     
@@ -328,13 +607,16 @@ class Database:
         Returns:
             List of unique urgency levels
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT DISTINCT urgency_level FROM triaged_messages ORDER BY urgency_level")
-        results = cursor.fetchall()
+        with self._lock:
+            if self._urgency_levels_cache is None:
+                cursor = self._conn.execute("SELECT DISTINCT urgency_level FROM triaged_messages ORDER BY urgency_level")
+                self._urgency_levels_cache = [row['urgency_level'] for row in cursor]
+            levels = list(self._urgency_levels_cache)
         
-        levels = [row['urgency_level'] for row in results]
-        conn.close()
-        
-        return levels
\ No newline at end of file
+        return levels
+    
+    def _invalidate_value_caches(self) -> None:
+        """Clear the cached triage categories and urgency levels."""
+        with self._lock:
+            self._categories_cache = None
+            self._urgency_levels_cache = None
\ No newline at end of file
@@ -2,14 +2,91 @@
 Process inbox messages from CSV and prepare for triage.
 """
 import csv
+import io
 import os
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List
-
-import pandas as pd
+from typing import IO, Iterator, List, Optional, Union
 
 from healthtriage.schemas import Message
 
+# Buffer size used when writing CSV files
+WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB
+
+# Non-ISO datetime formats accepted in CSV files, tried in order when
+# fromisoformat fails (US month-first dates, as pandas parses them)
+DATETIME_FORMATS = (
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%m/%d/%Y %I:%M:%S %p",
+    "%m/%d/%Y %I:%M %p",
+    "%m/%d/%Y",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d %H:%M",
+    "%Y/%m/%d",
+    "%b %d, %Y %I:%M %p",
+    "%d %b %Y %H:%M:%S",
+    "%a, %d %b %Y %H:%M:%S %z",
+)
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse a datetime string at ingestion time.
+    
+    This is the only place message datetimes are validated, so reads from
+    the database never need a parsing fallback.
+    
+    Args:
+        value: Raw datetime value from the CSV, in ISO 8601 or one of
+            DATETIME_FORMATS
+        
+    Returns:
+        The parsed datetime, or None if the value could not be parsed
+    """
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    
+    # fromisoformat only accepts a "Z" UTC suffix from Python 3.11
+    if value[-1:] in ("Z", "z"):
+        value = value[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+@contextmanager
+def _open_csv(source: Union[str, IO]) -> Iterator[IO[str]]:
+    """Open a CSV path or file-like object for reading as text.
+    
+    Args:
+        source: Path to the CSV file or an open text or binary file-like object
+        
+    Yields:
+        A text stream positioned at the start of the CSV data
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline='', encoding='utf-8-sig') as f:
+            yield f
+    elif isinstance(source, io.TextIOBase):
+        yield source
+    else:
+        # Binary file-likes (e.g. Streamlit uploads) are decoded in place and
+        # detached afterwards so the caller's object is left open
+        wrapper = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+        try:
+            yield wrapper
+        finally:
+            wrapper.detach()
+
 
 class MessageProcessor:
     """Process and load inbox messages from CSV files."""
@@ -22,54 +99,77 @@ class MessageProcessor:
         """
         self.csv_path = csv_path
     
-    def load_messages_from_csv(self, csv_path: str = None) -> List[Message]:
+    def load_messages_from_csv(self, csv_path: Union[str, IO] = None) -> List[Message]:
         """Load messages from a CSV file.
         
         Args:
-            csv_path: Path to the CSV file (overrides the one set in __init__)
+            csv_path: Path to the CSV file or an open file-like object
+                (overrides the path set in __init__)
             
         Returns:
             List of Message objects
         """
+        messages = []
+        for chunk in self.iter_messages_from_csv(csv_path):
+            messages.extend(chunk)
+        return messages
+    
+    def iter_messages_from_csv(self, csv_path: Union[str, IO] = None,
+                               chunksize: int = 10_000) -> Iterator[List[Message]]:
+        """Load messages from a CSV file in chunks.
+        
+        Only one chunk of the file is held in memory at a time.
+        
+        Args:
+            csv_path: Path to the CSV file or an open file-like object
+                (overrides the path set in __init__)
+            chunksize: Maximum number of messages per chunk
+            
+        Yields:
+            Lists of at most ``chunksize`` Message objects
+        """
         path = csv_path or self.csv_path
         if not path:
             raise ValueError("CSV file path not provided")
         
-        if not os.path.exists(path):
+        if isinstance(path, str) and not os.path.exists(path):
             raise FileNotFoundError(f"CSV file not found: {path}")
         
         try:
-            # Load the CSV file using pandas
-            df = pd.read_csv(path)
-            
-            # Check for required columns
-            required_columns = ['message_id', 'subject', 'message', 'datetime']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                raise ValueError(f"CSV file missing required columns: {', '.join(missing_columns)}")
-            
-            # Convert to Message objects
-            messages = []
-            for _, row in df.iterrows():
-                # Parse datetime from string
-                try:
-                    message_datetime = pd.to_datetime(row['datetime'])
-                except:
-                    # If datetime parsing fails, use current time
-                    print(f"Warning: Could not parse datetime for message ID {row['message_id']}, using current time")
-                    message_datetime = datetime.now()
+            with _open_csv(path) as f:
+                reader = csv.DictReader(f)
                 
-                # Create Message object
-                message = Message(
-                    message_id=str(row['message_id']),
-                    subject=str(row['subject']),
-                    message=str(row['message']),
-                    datetime=message_datetime
-                )
-                messages.append(message)
-            
-            return messages
+                # Check for required columns
+                required_columns = ['message_id', 'subject', 'message', 'datetime']
+                missing_columns = [col for col in required_columns if col not in (reader.fieldnames or [])]
+                
+                if missing_columns:
+                    raise ValueError(f"CSV file missing required columns: {', '.join(missing_columns)}")
+                
+                # Convert to Message objects, one chunk at a time
+                messages = []
+                for row in reader:
+                    message_datetime = parse_datetime(row['datetime'])
+                    if message_datetime is None:
+                        # If datetime parsing fails, use current time
+                        print(f"Warning: Could not parse datetime for message ID {row['message_id']}, using current time")
+                        message_datetime = datetime.now()
+                    
+                    # Create Message object
+                    message = Message(
+                        message_id=row['message_id'] or '',
+                        subject=row['subject'] or '',
+                        message=row['message'] or '',
+                        datetime=message_datetime
+                    )
+                    messages.append(message)
+                    
+                    if len(messages) >= chunksize:
+                        yield messages
+                        messages = []
+                
+                if messages:
+                    yield messages
             
         except Exception as e:
             raise Exception(f"Error loading messages from CSV: {e}")
@@ -82,16 +182,12 @@ class MessageProcessor:
             output_path: Path to save the CSV file
         """
         try:
-            with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            # A large buffer batches the output into few write syscalls
+            with open(output_path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
                 writer = csv.writer(f)
                 writer.writerow(['message_id', 'subject', 'message', 'datetime'])
-                
-                for message in messages:
-                    writer.writerow([
-                        message.message_id,
-                        message.subject,
-                        message.message,
-                        message.datetime.isoformat()
-                    ])
+                writer.writerows(
+                    (m.message_id, m.subject, m.message, m.datetime.isoformat()) for m in messages
+                )
         except Exception as e:
             raise Exception(f"Error saving messages to CSV: {e}")
@@ -1,12 +1,17 @@
 """
 Schema definitions for the HealthTriage application.
 """
+import sys
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+# Slotted dataclasses drop the per-instance __dict__, which roughly halves the
+# memory of large result lists; slots=True is only available on Python 3.10+
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+
+@dataclass(**_DATACLASS_OPTIONS)
 class Message:
     """Represents a message in the inbox."""
     message_id: str
@@ -15,7 +20,7 @@ class Message:
     datetime: datetime
     
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class TriagedMessage(Message):
     """Represents a triaged message with classification details."""
     # Category is now independent (e.g., "CLINICAL", "ADMINISTRATIVE", "PRESCRIPTION")
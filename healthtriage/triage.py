@@ -1,15 +1,508 @@
 """
 Message triage classification using NLP.
 """
+import asyncio
+import importlib.util
+import io
 import json
 import os
+import random
+import re
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+import numpy as np
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+try:
+    import tiktoken
+except ImportError:  # optional; message length is then estimated from characters
+    tiktoken = None
 
 from healthtriage.schemas import Message, TriagedMessage
 
+# Errors that are worth retrying: rate limits and transient network/server failures
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# HTTP/2 lets concurrent requests share a connection; it needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# HTTP client shared by the sync OpenAI clients of all triagers, so connections
+# and their TLS sessions are reused instead of each triager opening its own pool
+_HTTP_CLIENT = DefaultHttpxClient(http2=HTTP2_AVAILABLE)
+
+# Maximum number of attempts for a single API request
+MAX_ATTEMPTS = 5
+
+# Upper bound for the delay between attempts, in seconds
+MAX_RETRY_DELAY = 60
+
+# Batch job statuses after which the job will not change any more
+BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# Delay before the first batch status poll and upper bound for later polls,
+# in seconds; the delay doubles after each poll
+BATCH_POLL_INITIAL_DELAY = 5
+BATCH_POLL_MAX_DELAY = 60
+
+# Chat model used for triage; classification is a short structured task that
+# the small model handles well at a fraction of the latency and cost
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Larger model that low-confidence classifications are escalated to
+ESCALATION_MODEL = "gpt-4o"
+
+# Classifications below this confidence are re-run with ESCALATION_MODEL
+# when escalation is enabled
+ESCALATION_CONFIDENCE = 0.7
+
+# Confidence reported for messages classified by the keyword fast path
+FAST_PATH_CONFIDENCE = 0.95
+
+# Maximum number of words in a message body the keyword fast path will classify
+FAST_PATH_MAX_WORDS = 12
+
+# Subjects that don't add anything to a bare thanks or refill request (may be empty)
+FAST_PATH_SUBJECT_RE = re.compile(
+    r"((re|fwd?): ?)*((prescription |medication )?refill( request)?|thanks|thank you( note)?)?[.!]*"
+)
+
+# Keyword rules for messages that can be classified without the NLP model, as
+# (pattern, category, urgency level). A pattern must match the whole normalized
+# message body, so a message that says anything else goes to the model
+FAST_PATH_RULES = (
+    (re.compile(
+        r"((hi|hello|dear) (dr\.? ?[a-z]+|doctor|doc|team)[,.!]? )?"
+        r"(please |(could|can) you (please )?)?refill my [a-z][a-z-]*( prescription| medication)?( please)?[.!?]*"
+        r"( thanks?( you)?[.!]*)?"
+    ), "PRESCRIPTION", 2),
+    (re.compile(
+        r"(thank you|thanks)( so much| very much)?(,? (dr\.? ?[a-z]+|doctor|doc|everyone|all|team|again))?"
+        r"( for (everything|your help|the help|your care|the great care|the visit|seeing me))?"
+        r"(,? (dr\.? ?[a-z]+|doctor|doc|everyone|all|team|again))?[.!]*"
+    ), "INFORMATIONAL", 1),
+)
+
+# Embedding model used to look up near-duplicate messages in the semantic cache
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Minimum cosine similarity for a cached triage result to be reused
+SIMILARITY_THRESHOLD = 0.92
+
+# Maximum number of message body tokens sent to the chat model; the category
+# and urgency are almost always clear from the start of a message
+MAX_MESSAGE_TOKENS = 512
+
+# Rough characters per token, used to truncate when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+# Appended to message bodies that were truncated
+TRUNCATION_MARKER = " …[truncated]"
+
+# Tokenizer used by the gpt-4o model family
+TOKENIZER_ENCODING = "o200k_base"
+
+# Quoted lines of earlier messages in a reply
+QUOTED_LINE_RE = re.compile(r"^[ \t]*>.*(\n|$)", re.M)
+
+# Start of a quoted earlier message or an email signature: a reply header, the
+# RFC 3676 signature delimiter ("-- " alone on a line) or a mobile sign-off
+TRAILER_RE = re.compile(
+    r"^(?:[ \t]*-{2,}[ \t]*Original Message[ \t]*-{2,}[ \t]*|[ \t]*On .{1,200}wrote:[ \t]*"
+    r"|(?P<signature>-- )|[ \t]*Sent from my [^\r\n]+)\r?$",
+    re.M | re.I
+)
+
+# Maximum number of unquoted lines after a signature delimiter that are
+# treated as the signature
+SIGNATURE_MAX_LINES = 4
+
+# Worked examples included in the system prompt as (subject, message, category,
+# urgency level). Besides guiding the model, they keep the static prompt prefix
+# above PROMPT_CACHE_MIN_TOKENS
+TRIAGE_EXAMPLES = (
+    ("Chest pain", "I've had crushing chest pain and shortness of breath for the last 30 minutes.",
+     "CLINICAL", 5),
+    ("Rash after new antibiotic", "My lips started swelling an hour after my first dose of amoxicillin.",
+     "PRESCRIPTION", 5),
+    ("Fever not improving", "My temperature has been 103F for two days and I can't keep fluids down.",
+     "CLINICAL", 4),
+    ("Out of insulin", "I will run out of insulin tomorrow and my pharmacy says the prescription expired.",
+     "PRESCRIPTION", 4),
+    ("Lab results question", "My cholesterol came back high on the portal. Should I be worried?",
+     "CLINICAL", 3),
+    ("Refill request", "Could you please refill my lisinopril? I have about a week left.",
+     "PRESCRIPTION", 2),
+    ("Reschedule appointment", "I need to move my check-up next Tuesday to later in the month.",
+     "ADMINISTRATIVE", 2),
+    ("Billing question", "I was charged twice for my last visit. Who should I talk to about a refund?",
+     "ADMINISTRATIVE", 2),
+    ("Records request", "Please send a copy of my vaccination records to my new employer.",
+     "ADMINISTRATIVE", 1),
+    ("Thank you", "Thanks to the whole team for taking such good care of me last week!",
+     "INFORMATIONAL", 1),
+    ("Flu shot availability", "Are you offering flu shots this season, and do I need an appointment?",
+     "INFORMATIONAL", 1),
+    ("Fell and hit his head", "My father fell this morning, hit his head, and now he is confused and vomiting.",
+     "CLINICAL", 5),
+    ("Wound looks worse", "The incision from my surgery last week is red, warm and leaking pus.",
+     "CLINICAL", 4),
+    ("Lingering cough", "My cough has lasted three weeks and I'm now bringing up green mucus.",
+     "CLINICAL", 3),
+    ("Missed doses", "I forgot my blood pressure pills for three days. Should I take a double dose today?",
+     "PRESCRIPTION", 3),
+    ("Side effects", "The new statin is giving me mild muscle aches. Is that normal?",
+     "PRESCRIPTION", 3),
+    ("Paperwork for work", "Could the doctor fill out my FMLA forms? My employer needs them by Friday.",
+     "ADMINISTRATIVE", 3),
+    ("Referral needed", "My insurance requires a referral before I can see the dermatologist next month.",
+     "ADMINISTRATIVE", 2),
+    ("Change of address", "I moved recently. Please update my address and phone number in my chart.",
+     "ADMINISTRATIVE", 1),
+    ("Blood pressure log", "Here are my home blood pressure readings for the month, all around 120/80.",
+     "INFORMATIONAL", 1),
+)
+
+# OpenAI only caches prompt prefixes of at least this many tokens
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+# Extra tokens the system prompt must have beyond PROMPT_CACHE_MIN_TOKENS, so
+# small edits to the prompt cannot drop it below the caching threshold
+PROMPT_CACHE_MARGIN_TOKENS = 256
+
+
+def _retry_delay(attempt: int) -> float:
+    """Get the jittered exponential backoff delay after a failed attempt.
+    
+    Args:
+        attempt: Zero-based index of the attempt that failed
+        
+    Returns:
+        Number of seconds to wait before the next attempt
+    """
+    return min(MAX_RETRY_DELAY, 2 ** attempt + random.random())
+
+
+def _fast_path_result(message: Message) -> Optional[Dict]:
+    """Classify a message by keyword matching, if it is a bare routine request.
+    
+    Only messages that consist of nothing but a short thank-you or a refill
+    request are classified; anything longer or with any other content needs
+    the NLP model.
+    
+    Args:
+        message: The message to classify
+        
+    Returns:
+        Classification result for a confident keyword match, or None if the
+        message needs the NLP model
+    """
+    words = message.message.lower().split()
+    if not words or len(words) > FAST_PATH_MAX_WORDS:
+        return None
+    if not FAST_PATH_SUBJECT_RE.fullmatch(" ".join(message.subject.lower().split())):
+        return None
+    
+    text = " ".join(words)
+    for pattern, category, urgency_level in FAST_PATH_RULES:
+        if pattern.fullmatch(text):
+            return {"category": category, "urgency_level": urgency_level, "confidence": FAST_PATH_CONFIDENCE}
+    return None
+
+
+@lru_cache(maxsize=1)
+def _get_tokenizer():
+    """Get the tiktoken encoding used to measure messages.
+    
+    Returns:
+        The encoding, or None if tiktoken is unavailable or its encoding
+        data cannot be loaded
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        print(f"Could not load tokenizer, estimating message length instead: {e}")
+        return None
+
+
+def _is_trailer(text: str, match: "re.Match") -> bool:
+    """Check whether a trailer match starts a part that can be dropped.
+    
+    Everything after a reply header must be quoted lines, and everything after
+    a signature delimiter must be a short signature, up to the next trailer
+    (which must satisfy the same check) or the end of the message.
+    
+    Args:
+        text: Message body
+        match: TRAILER_RE match in ``text``
+        
+    Returns:
+        True if the text from ``match`` on holds no new message content
+    """
+    next_match = TRAILER_RE.search(text, match.end())
+    end = next_match.start() if next_match else len(text)
+    unquoted_lines = [
+        line for line in text[match.end():end].splitlines()
+        if line.strip() and not line.lstrip().startswith(">")
+    ]
+    allowed_lines = SIGNATURE_MAX_LINES if match.group("signature") else 0
+    if len(unquoted_lines) > allowed_lines:
+        return False
+    return next_match is None or _is_trailer(text, next_match)
+
+
+def _truncate_message(text: str) -> str:
+    """Shorten a message body before it is sent to the chat model.
+    
+    A trailing quoted earlier message or signature is dropped, other quoted
+    lines are removed, and what remains is cut to at most MAX_MESSAGE_TOKENS
+    tokens.
+    
+    Args:
+        text: Message body
+        
+    Returns:
+        The shortened message body
+    """
+    for match in TRAILER_RE.finditer(text):
+        if match.start() > 0 and _is_trailer(text, match):
+            text = text[:match.start()]
+            break
+    text = QUOTED_LINE_RE.sub("", text).strip() or text.strip()
+    
+    # Every token covers at least one character, so short messages never need encoding
+    if len(text) <= MAX_MESSAGE_TOKENS:
+        return text
+    
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        limit = MAX_MESSAGE_TOKENS * CHARS_PER_TOKEN
+        return text if len(text) <= limit else text[:limit] + TRUNCATION_MARKER
+    
+    tokens = tokenizer.encode(text)
+    if len(tokens) <= MAX_MESSAGE_TOKENS:
+        return text
+    return tokenizer.decode(tokens[:MAX_MESSAGE_TOKENS]) + TRUNCATION_MARKER
+
+
+def _embedding_text(message: Message) -> str:
+    """Get the text that is embedded for a message."""
+    return f"{message.subject}\n{message.message}"
+
+
+class SemanticCache:
+    """Cache of triage results keyed by message embeddings.
+    
+    Healthcare inboxes contain many near-identical messages (refill requests,
+    thank-you notes). A message whose embedding is close enough to one that was
+    already classified reuses that classification instead of calling the
+    chat model. Vectors are kept in a NumPy matrix and compared with a single
+    matrix-vector product, which is fast enough for the tens of thousands of
+    entries an inbox produces.
+    """
+    
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, path: Optional[str] = None):
+        """Initialize the cache, loading saved entries if ``path`` exists.
+        
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            path: Optional .npz file the cache is loaded from and saved to
+        """
+        self.threshold = threshold
+        self.path = path
+        self._lock = threading.Lock()
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._size = 0
+        self._results: List[Dict] = []
+        
+        if path and os.path.exists(path):
+            self.load(path)
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def lookup(self, vector: np.ndarray) -> Optional[Dict]:
+        """Find the cached result for the most similar message.
+        
+        Args:
+            vector: Embedding of the message being triaged
+            
+        Returns:
+            The cached classification result, or None if no cached message is
+            at least ``threshold`` similar
+        """
+        vector = self._normalize(vector)
+        with self._lock:
+            if not self._size:
+                return None
+            scores = self._vectors[:self._size] @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            return dict(self._results[best])
+    
+    def add(self, vector: np.ndarray, result: Dict) -> None:
+        """Add a classification result to the cache.
+        
+        Args:
+            vector: Embedding of the classified message
+            result: Classification result with category, urgency_level and confidence
+        """
+        vector = self._normalize(vector)
+        with self._lock:
+            # Grow the matrix geometrically so adds are amortized O(1)
+            if self._size == len(self._vectors):
+                capacity = max(64, 2 * len(self._vectors))
+                grown = np.empty((capacity, len(vector)), dtype=np.float32)
+                if self._size:
+                    grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+            self._vectors[self._size] = vector
+            self._size += 1
+            self._results.append({
+                "category": result["category"],
+                "urgency_level": int(result["urgency_level"]),
+                "confidence": float(result["confidence"]),
+            })
+    
+    def save(self, path: Optional[str] = None) -> None:
+        """Save the cache to an .npz file.
+        
+        Args:
+            path: File to save to (defaults to the path given at construction)
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("Semantic cache path not provided")
+        
+        # Write to a temporary file first so an interrupted save never
+        # leaves a truncated cache behind. Passing a file object also stops
+        # NumPy from appending ".npz" to the path.
+        temp_path = f"{path}.tmp"
+        with self._lock:
+            with open(temp_path, "wb") as f:
+                np.savez(
+                    f,
+                    vectors=self._vectors[:self._size],
+                    categories=np.array([r["category"] for r in self._results], dtype=str),
+                    urgency_levels=np.array([r["urgency_level"] for r in self._results], dtype=np.int64),
+                    confidences=np.array([r["confidence"] for r in self._results], dtype=np.float64),
+                )
+            os.replace(temp_path, path)
+    
+    def load(self, path: str) -> None:
+        """Replace the cache contents with entries saved by save().
+        
+        Args:
+            path: .npz file to load
+        """
+        with np.load(path) as data:
+            vectors = data["vectors"].astype(np.float32)
+            results = [
+                {"category": str(category), "urgency_level": int(level), "confidence": float(confidence)}
+                for category, level, confidence in zip(data["categories"], data["urgency_levels"],
+                                                       data["confidences"])
+            ]
+        
+        with self._lock:
+            self._vectors = vectors
+            self._size = len(vectors)
+            self._results = results
+    
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        """Scale a vector to unit length so dot products are cosine similarities."""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def _check_system_prompt_length(prompt: str) -> Optional[int]:
+    """Check that the system prompt is long enough to be cached by OpenAI.
+    
+    Args:
+        prompt: System prompt sent at the start of every chat request
+        
+    Returns:
+        Number of tokens in the prompt, or None if the tokenizer is unavailable
+        
+    Raises:
+        ValueError: If the prompt has fewer than PROMPT_CACHE_MIN_TOKENS plus
+            PROMPT_CACHE_MARGIN_TOKENS tokens
+    """
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return None
+    
+    num_tokens = len(tokenizer.encode(prompt))
+    if num_tokens < PROMPT_CACHE_MIN_TOKENS + PROMPT_CACHE_MARGIN_TOKENS:
+        raise ValueError(
+            f"System prompt has {num_tokens} tokens, but prompt caching needs at least "
+            f"{PROMPT_CACHE_MIN_TOKENS} plus a margin of {PROMPT_CACHE_MARGIN_TOKENS}"
+        )
+    return num_tokens
+
+
+def _build_system_prompt(categories: List[str], triage_description: str) -> str:
+    """Build the system prompt for the NLP model.
+    
+    Args:
+        categories: The possible triage categories
+        triage_description: Markdown description of the triage schema
+        
+    Returns:
+        System prompt explaining the triage task
+    """
+    categories = ", ".join(categories)
+    examples = "\n\n".join(
+        f"Subject: {subject}\nMessage: {message}\n-> category: {category}, urgency_level: {urgency_level}"
+        for subject, message, category, urgency_level in TRIAGE_EXAMPLES
+    )
+    
+    return f"""You are an expert healthcare message triage assistant. Your task is to independently analyze two aspects of each message:
+
+1. CATEGORY: Classify the message into one of the following categories: {categories}
+2. URGENCY LEVEL: Assign an urgency level from 1-5, with 5 being most urgent
+
+Category definitions:
+- CLINICAL: Medical issues, symptoms, test results, health concerns
+- PRESCRIPTION: Medication-related issues, refill requests, dosage questions
+- ADMINISTRATIVE: Appointments, billing, records, referrals
+- INFORMATIONAL: General information, thank you notes, updates
+
+Urgency level definitions:
+- 5 (IMMEDIATE): Potentially life-threatening, requires immediate attention
+- 4 (URGENT): Urgent but not immediately life-threatening
+- 3 (PRIORITY): Higher priority than routine, should be addressed soon
+- 2 (ROUTINE): Normal priority, can be handled within standard timeframes
+- 1 (LOW): Low priority, informational only
+
+Analyze both the subject and message content to determine both aspects.
+Respond with a JSON object containing:
+1. "category": The assigned category (one of the categories listed above)
+2. "urgency_level": A number between 1 and 5 representing urgency
+3. "confidence": A number between 0 and 1 indicating your confidence in the classification
+
+Always err on the side of caution - if in doubt between two urgency levels, choose the higher one.
+
+Examples:
+{examples}
+
+The full triage classification guide follows for reference.
+
+{triage_description}"""
+
 
 class MessageTriager:
     """Classify and triage healthcare messages using NLP."""
@@ -31,30 +524,28 @@ class MessageTriager:
         "LOW": 1          # Low priority/no action required
     }
     
-    def __init__(self, api_key: str = ""):
-        """Initialize the message triager.
-        
-        Args:
-            api_key: OpenAI API key (defaults to env var)
-        """
-        # Get the API key from the environment if not provided
-        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
-            raise ValueError("OpenAI API key not provided and not found in environment variables")
-        
-        # Initialize the OpenAI client
-        # The newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-        # Do not change this unless explicitly requested by the user
-        self.openai_client = OpenAI(api_key=self.api_key)
-        self.model = "gpt-4o"
+    # Structured output schema for classification responses; strict mode
+    # guarantees valid JSON with exactly these fields
+    TRIAGE_SCHEMA = {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "triage",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string", "enum": TRIAGE_CATEGORIES},
+                    "urgency_level": {"type": "integer", "enum": sorted(URGENCY_LEVELS.values())},
+                    "confidence": {"type": "number"}
+                },
+                "required": ["category", "urgency_level", "confidence"],
+                "additionalProperties": False
+            }
+        }
+    }
     
-    def get_triage_description(self) -> str:
-        """Get a description of the triage classification schema.
-        
-        Returns:
-            Markdown description of the triage schema
-        """
-        description = """# Healthcare Message Triage Classification System
+    # Markdown description of the triage schema shown in the app
+    TRIAGE_DESCRIPTION = """# Healthcare Message Triage Classification System
 
 ## Overview
 This system independently classifies incoming healthcare messages by:
@@ -126,7 +617,55 @@ Low priority or no action required:
 ## Implementation
 Each message receives both a category and an urgency level, allowing staff to prioritize messages by urgency while also organizing workflow by category.
 """
-        return description
+    
+    # System prompt, built once so every request sends the identical prefix
+    SYSTEM_PROMPT = _build_system_prompt(TRIAGE_CATEGORIES, TRIAGE_DESCRIPTION)
+    
+    def __init__(self, api_key: str = "", semantic_cache: Optional[SemanticCache] = None,
+                 model: str = DEFAULT_MODEL, escalate_on_low_confidence: bool = False,
+                 fast_path: bool = False):
+        """Initialize the message triager.
+        
+        Args:
+            api_key: OpenAI API key (defaults to env var)
+            semantic_cache: Optional cache used to reuse the classification of
+                near-duplicate messages; each lookup costs one embeddings call
+            model: Chat model used to classify messages
+            escalate_on_low_confidence: Re-classify messages with
+                ESCALATION_MODEL when ``model`` reports a confidence below
+                ESCALATION_CONFIDENCE (not applied to Batch API jobs)
+            fast_path: Classify messages that are nothing but a short
+                thank-you or refill request by keyword matching instead of the
+                NLP model (not applied to Batch API jobs)
+        """
+        # Get the API key from the environment if not provided
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError("OpenAI API key not provided and not found in environment variables")
+        
+        # Initialize the OpenAI client
+        # (retries are handled by _call_with_retries, so the client's own are disabled)
+        self.openai_client = OpenAI(api_key=self.api_key, max_retries=0, http_client=_HTTP_CLIENT)
+        self.model = model or DEFAULT_MODEL
+        self.escalate_on_low_confidence = escalate_on_low_confidence
+        self.fast_path = fast_path
+        self.semantic_cache = semantic_cache
+        
+        # Prompt tokens sent to the chat model, and how many of them were
+        # served from OpenAI's prompt cache
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._usage_lock = threading.Lock()
+        
+        _check_system_prompt_length(self.SYSTEM_PROMPT)
+    
+    def get_triage_description(self) -> str:
+        """Get a description of the triage classification schema.
+        
+        Returns:
+            Markdown description of the triage schema
+        """
+        return self.TRIAGE_DESCRIPTION
     
     def triage_message(self, message: Message) -> TriagedMessage:
         """Classify a message into a triage category and assign an urgency level using NLP.
@@ -137,98 +676,489 @@ Each message receives both a category and an urgency level, allowing staff to pr
         Returns:
             TriagedMessage with classification details
         """
-        # Construct prompt for the NLP model
-        prompt = self._construct_triage_prompt(message)
+        if self.fast_path:
+            result = _fast_path_result(message)
+            if result is not None:
+                return self._build_triaged_message(message, result)
         
         # Call OpenAI API to classify the message
         try:
-            response = self.openai_client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.1
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            
-            # Create a triaged message with the classification
-            triaged_message = TriagedMessage(
-                message_id=message.message_id,
-                subject=message.subject,
-                message=message.message,
-                datetime=message.datetime,
-                triage_category=result["category"],
-                urgency_level=result["urgency_level"],
-                confidence=result["confidence"],
-                processed_at=datetime.now()
-            )
+            # Reuse the result for a near-duplicate message if one is cached
+            vector = None
+            if self.semantic_cache is not None:
+                response = self._call_with_retries(
+                    self.openai_client.embeddings.create,
+                    model=EMBEDDING_MODEL, input=_embedding_text(message)
+                )
+                vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+                cached = self.semantic_cache.lookup(vector)
+                if cached is not None:
+                    return self._build_triaged_message(message, cached)
             
+            result = self._classify(message, self.model)
+            if self._should_escalate(result):
+                result = self._classify(message, ESCALATION_MODEL)
+            triaged_message = self._build_triaged_message(message, result)
+            if vector is not None:
+                self.semantic_cache.add(vector, result)
             return triaged_message
             
         except Exception as e:
             # In case of error, assign to CLINICAL category as a safe default
             # In a production system, you might want to handle this differently
             print(f"Error triaging message: {e}")
-            return TriagedMessage(
-                message_id=message.message_id,
-                subject=message.subject,
-                message=message.message,
-                datetime=message.datetime,
-                triage_category="CLINICAL",
-                urgency_level=3,  # Medium urgency as a safe default
-                confidence=0.5,
-                processed_at=datetime.now()
-            )
+            return self._build_fallback_message(message)
     
-    def batch_triage_messages(self, messages: List[Message]) -> List[TriagedMessage]:
+    def batch_triage_messages(self, messages: List[Message],
+                              max_concurrent: int = 20) -> List[TriagedMessage]:
         """Triage multiple messages in batch.
         
+        Synchronous wrapper around batch_triage, so the requests run
+        concurrently. Must not be called from inside a running event loop;
+        await batch_triage directly there instead.
+        
+        Args:
+            messages: List of messages to triage
+            max_concurrent: Maximum number of concurrent API requests
+            
+        Returns:
+            List of triaged messages, in the same order as ``messages``
+        """
+        return asyncio.run(self.batch_triage(messages, max_concurrent=max_concurrent))
+    
+    async def batch_triage(self,
+                           messages: List[Message],
+                           max_concurrent: int = 20,
+                           on_result: Optional[Callable[[int, int, TriagedMessage], None]] = None
+                           ) -> List[TriagedMessage]:
+        """Triage multiple messages concurrently.
+        
+        Up to ``max_concurrent`` API requests are in flight at once. A failed
+        request falls back to the default classification for that message
+        only, so one error does not abort the rest of the batch. If the
+        semantic cache has a path, it is saved once the batch finishes.
+        
+        Args:
+            messages: List of messages to triage
+            max_concurrent: Maximum number of concurrent API requests
+            on_result: Optional callback invoked as ``on_result(done, total, triaged_message)``
+                each time a message finishes
+            
+        Returns:
+            List of triaged messages, in the same order as ``messages``
+        """
+        total = len(messages)
+        results: List[Optional[TriagedMessage]] = [None] * total
+        semaphore = asyncio.Semaphore(max_concurrent)
+        prompt_tokens, cached_tokens = self.prompt_tokens, self.cached_tokens
+        
+        # The async client is bound to the running event loop, so create one per batch
+        async with AsyncOpenAI(api_key=self.api_key, max_retries=0,
+                               http_client=DefaultAsyncHttpxClient(http2=HTTP2_AVAILABLE)) as client:
+            async def triage_one(index: int, message: Message) -> Tuple[int, TriagedMessage]:
+                async with semaphore:
+                    return index, await self._atriage_message(client, message)
+            
+            tasks = [triage_one(i, message) for i, message in enumerate(messages)]
+            for done, future in enumerate(asyncio.as_completed(tasks), start=1):
+                index, triaged_message = await future
+                results[index] = triaged_message
+                if on_result:
+                    on_result(done, total, triaged_message)
+        
+        if self.semantic_cache is not None and self.semantic_cache.path:
+            self.semantic_cache.save()
+        
+        prompt_tokens = self.prompt_tokens - prompt_tokens
+        if prompt_tokens:
+            cached_tokens = self.cached_tokens - cached_tokens
+            print(f"Prompt cache: {cached_tokens} of {prompt_tokens} prompt tokens cached "
+                  f"({cached_tokens / prompt_tokens:.0%})")
+        
+        return results
+    
+    def submit_batch(self, messages: List[Message]) -> str:
+        """Submit messages for triage through the OpenAI Batch API.
+        
+        Batch jobs run asynchronously at a lower cost and with a separate
+        rate limit pool, which suits large uploads. Use wait_for_batch to
+        wait for the job and collect its results.
+        
         Args:
             messages: List of messages to triage
             
         Returns:
-            List of triaged messages
+            ID of the created batch job
         """
-        return [self.triage_message(message) for message in messages]
+        lines = [
+            json.dumps({
+                "custom_id": message.message_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._get_completion_params(message)
+            })
+            for message in messages
+        ]
+        batch_input = io.BytesIO("\n".join(lines).encode("utf-8"))
+        
+        input_file = self._call_with_retries(
+            self.openai_client.files.create,
+            file=("triage_batch.jsonl", batch_input),
+            purpose="batch"
+        )
+        batch = self._call_with_retries(
+            self.openai_client.batches.create,
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+    
+    def wait_for_batch(self, batch_id: str, messages: List[Message],
+                       on_poll: Optional[Callable[[Any], None]] = None) -> List[TriagedMessage]:
+        """Wait for a batch job to finish and return its triaged messages.
+        
+        The job is polled with exponential backoff, starting at
+        BATCH_POLL_INITIAL_DELAY seconds and capped at BATCH_POLL_MAX_DELAY.
+        
+        Args:
+            batch_id: ID of the batch job returned by submit_batch
+            messages: The messages that were submitted in the batch
+            on_poll: Optional callback invoked with the OpenAI Batch object
+                after every status poll
+            
+        Returns:
+            List of triaged messages, in the same order as ``messages``
+            
+        Raises:
+            RuntimeError: If the job fails, expires or is cancelled
+        """
+        delay = BATCH_POLL_INITIAL_DELAY
+        while True:
+            batch = self.retrieve_batch(batch_id)
+            if on_poll:
+                on_poll(batch)
+            if batch.status in BATCH_TERMINAL_STATUSES:
+                break
+            time.sleep(delay)
+            delay = min(BATCH_POLL_MAX_DELAY, delay * 2)
+        
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch job {batch_id} ended with status '{batch.status}'")
+        
+        return self.parse_batch_results(batch, messages)
+    
+    def retrieve_batch(self, batch_id: str):
+        """Get the current state of a batch job.
+        
+        Args:
+            batch_id: ID of the batch job
+            
+        Returns:
+            OpenAI Batch object
+        """
+        return self._call_with_retries(self.openai_client.batches.retrieve, batch_id)
+    
+    def parse_batch_results(self, batch, messages: List[Message]) -> List[TriagedMessage]:
+        """Build triaged messages from the output of a finished batch job.
+        
+        Messages whose request failed get the default classification, as in
+        triage_message. A job that produced no successful results at all is
+        treated as failed rather than saved as all-default classifications.
+        
+        Args:
+            batch: Finished OpenAI Batch object
+            messages: The messages that were submitted in the batch
+            
+        Returns:
+            List of triaged messages, in the same order as ``messages``
+            
+        Raises:
+            RuntimeError: If the job has no output file or no successful requests
+        """
+        results = {}
+        if batch.output_file_id:
+            output = self._call_with_retries(
+                self.openai_client.files.content, batch.output_file_id
+            ).text
+            for line in output.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") != 200:
+                    continue
+                try:
+                    content = response["body"]["choices"][0]["message"]["content"]
+                    results[record["custom_id"]] = json.loads(content)
+                except (KeyError, IndexError, ValueError) as e:
+                    print(f"Error parsing batch result for message {record.get('custom_id')}: {e}")
+        
+        if messages and not results:
+            raise RuntimeError(
+                f"Batch job {batch.id} returned no successful results: "
+                f"{self._batch_error_summary(batch)}"
+            )
+        
+        triaged_messages = []
+        for message in messages:
+            result = results.get(message.message_id)
+            if result is None:
+                print(f"Error triaging message {message.message_id}: no batch result")
+                triaged_messages.append(self._build_fallback_message(message))
+                continue
+            try:
+                triaged_messages.append(self._build_triaged_message(message, result))
+            except KeyError as e:
+                print(f"Error triaging message {message.message_id}: missing {e}")
+                triaged_messages.append(self._build_fallback_message(message))
+        
+        return triaged_messages
+    
+    def _batch_error_summary(self, batch) -> str:
+        """Describe why the requests of a batch job failed.
+        
+        Args:
+            batch: Finished OpenAI Batch object
+            
+        Returns:
+            The first error from the job's error file, or a generic note if
+            the job has no error file
+        """
+        if not batch.error_file_id:
+            return "no output or error file"
+        
+        errors = self._call_with_retries(
+            self.openai_client.files.content, batch.error_file_id
+        ).text
+        for line in errors.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            error = record.get("error") or {}
+            response = record.get("response") or {}
+            body_error = (response.get("body") or {}).get("error") or {}
+            message = error.get("message") or body_error.get("message")
+            status = response.get("status_code")
+            if message:
+                return f"{message} (status {status})" if status else message
+        return "error file is empty"
+    
+    async def _atriage_message(self, client: AsyncOpenAI, message: Message) -> TriagedMessage:
+        """Async counterpart of triage_message using the given client.
+        
+        Args:
+            client: Async OpenAI client to send the request with
+            message: The message to classify
+            
+        Returns:
+            TriagedMessage with classification details
+        """
+        if self.fast_path:
+            result = _fast_path_result(message)
+            if result is not None:
+                return self._build_triaged_message(message, result)
+        
+        try:
+            vector = None
+            if self.semantic_cache is not None:
+                response = await self._acall_with_retries(
+                    client.embeddings.create,
+                    model=EMBEDDING_MODEL, input=_embedding_text(message)
+                )
+                vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+                cached = self.semantic_cache.lookup(vector)
+                if cached is not None:
+                    return self._build_triaged_message(message, cached)
+            
+            result = await self._aclassify(client, message, self.model)
+            if self._should_escalate(result):
+                result = await self._aclassify(client, message, ESCALATION_MODEL)
+            triaged_message = self._build_triaged_message(message, result)
+            if vector is not None:
+                self.semantic_cache.add(vector, result)
+            return triaged_message
+            
+        except Exception as e:
+            print(f"Error triaging message: {e}")
+            return self._build_fallback_message(message)
+    
+    def _classify(self, message: Message, model: str) -> Dict:
+        """Classify a message with the given chat model.
+        
+        Args:
+            message: The message to classify
+            model: Chat model to use
+            
+        Returns:
+            Parsed classification result
+        """
+        response = self._call_with_retries(
+            self.openai_client.chat.completions.create,
+            **self._get_completion_params(message, model)
+        )
+        self._record_usage(response)
+        return json.loads(response.choices[0].message.content)
+    
+    async def _aclassify(self, client: AsyncOpenAI, message: Message, model: str) -> Dict:
+        """Async counterpart of _classify using the given client.
+        
+        Args:
+            client: Async OpenAI client to send the request with
+            message: The message to classify
+            model: Chat model to use
+            
+        Returns:
+            Parsed classification result
+        """
+        response = await self._acall_with_retries(
+            client.chat.completions.create,
+            **self._get_completion_params(message, model)
+        )
+        self._record_usage(response)
+        return json.loads(response.choices[0].message.content)
+    
+    def _record_usage(self, response) -> None:
+        """Add the token usage of a chat completion to the running totals.
+        
+        Args:
+            response: OpenAI ChatCompletion object
+        """
+        usage = response.usage
+        if usage is None:
+            return
+        details = usage.prompt_tokens_details
+        cached_tokens = (details.cached_tokens or 0) if details else 0
+        with self._usage_lock:
+            self.prompt_tokens += usage.prompt_tokens
+            self.cached_tokens += cached_tokens
+    
+    def _should_escalate(self, result: Dict) -> bool:
+        """Check whether a classification should be re-run with ESCALATION_MODEL.
+        
+        Args:
+            result: Parsed classification result
+            
+        Returns:
+            True if escalation is enabled and the result is low confidence
+        """
+        return (self.escalate_on_low_confidence
+                and self.model != ESCALATION_MODEL
+                and result.get("confidence", 0) < ESCALATION_CONFIDENCE)
+    
+    def _call_with_retries(self, func: Callable, *args, **kwargs) -> Any:
+        """Call an OpenAI API method, retrying transient failures with backoff.
+        
+        Args:
+            func: The API method to call
+            *args: Positional arguments for the method
+            **kwargs: Keyword arguments for the method
+            
+        Returns:
+            The method's return value
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return func(*args, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                delay = _retry_delay(attempt)
+                print(f"OpenAI request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    async def _acall_with_retries(self, func: Callable, *args, **kwargs) -> Any:
+        """Async counterpart of _call_with_retries.
+        
+        Args:
+            func: The async API method to call
+            *args: Positional arguments for the method
+            **kwargs: Keyword arguments for the method
+            
+        Returns:
+            The method's return value
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return await func(*args, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                delay = _retry_delay(attempt)
+                print(f"OpenAI request failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
+    def _get_completion_params(self, message: Message, model: Optional[str] = None) -> Dict:
+        """Get the chat completion request parameters for a message.
+        
+        Args:
+            message: The message to classify
+            model: Chat model to use (defaults to the triager's model)
+            
+        Returns:
+            Keyword arguments for ``chat.completions.create``
+        """
+        return {
+            "model": model or self.model,
+            "messages": [
+                {"role": "system", "content": self._get_system_prompt()},
+                {"role": "user", "content": self._construct_triage_prompt(message)}
+            ],
+            "response_format": self.TRIAGE_SCHEMA,
+            "temperature": 0.1
+        }
+    
+    def _build_triaged_message(self, message: Message, result: Dict) -> TriagedMessage:
+        """Create a triaged message from a parsed classification result.
+        
+        Args:
+            message: The message that was classified
+            result: Parsed JSON response from the NLP model
+            
+        Returns:
+            TriagedMessage with classification details
+        """
+        return TriagedMessage(
+            message_id=message.message_id,
+            subject=message.subject,
+            message=message.message,
+            datetime=message.datetime,
+            triage_category=result["category"],
+            urgency_level=result["urgency_level"],
+            confidence=result["confidence"],
+            processed_at=datetime.now()
+        )
+    
+    def _build_fallback_message(self, message: Message) -> TriagedMessage:
+        """Create a triaged message with the safe default classification.
+        
+        Args:
+            message: The message that could not be classified
+            
+        Returns:
+            TriagedMessage assigned to CLINICAL with medium urgency
+        """
+        return TriagedMessage(
+            message_id=message.message_id,
+            subject=message.subject,
+            message=message.message,
+            datetime=message.datetime,
+            triage_category="CLINICAL",
+            urgency_level=3,  # Medium urgency as a safe default
+            confidence=0.5,
+            processed_at=datetime.now()
+        )
     
     def _get_system_prompt(self) -> str:
         """Get the system prompt for the NLP model.
         
+        The prompt is identical for every message and is sent before the
+        per-message user prompt, so OpenAI can serve it from its prompt cache.
+        
         Returns:
             System prompt explaining the triage task
         """
-        categories = ", ".join(self.TRIAGE_CATEGORIES)
-        urgency_levels = ", ".join([f"{k} ({v})" for k, v in self.URGENCY_LEVELS.items()])
-        
-        return f"""You are an expert healthcare message triage assistant. Your task is to independently analyze two aspects of each message:
-
-1. CATEGORY: Classify the message into one of the following categories: {categories}
-2. URGENCY LEVEL: Assign an urgency level from 1-5, with 5 being most urgent
-
-Category definitions:
-- CLINICAL: Medical issues, symptoms, test results, health concerns
-- PRESCRIPTION: Medication-related issues, refill requests, dosage questions
-- ADMINISTRATIVE: Appointments, billing, records, referrals
-- INFORMATIONAL: General information, thank you notes, updates
-
-Urgency level definitions:
-- 5 (IMMEDIATE): Potentially life-threatening, requires immediate attention
-- 4 (URGENT): Urgent but not immediately life-threatening
-- 3 (PRIORITY): Higher priority than routine, should be addressed soon
-- 2 (ROUTINE): Normal priority, can be handled within standard timeframes
-- 1 (LOW): Low priority, informational only
-
-Analyze both the subject and message content to determine both aspects.
-Respond with a JSON object containing:
-1. "category": The assigned category (one of the categories listed above)
-2. "urgency_level": A number between 1 and 5 representing urgency
-3. "confidence": A number between 0 and 1 indicating your confidence in the classification
-4. "reasoning": A brief explanation of why you assigned this category and urgency level
-
-Always err on the side of caution - if in doubt between two urgency levels, choose the higher one."""
+        return self.SYSTEM_PROMPT
     
     def _construct_triage_prompt(self, message: Message) -> str:
         """Construct the prompt for the triage classification.
@@ -244,8 +1174,52 @@ Always err on the side of caution - if in doubt between two urgency levels, choo
 Subject: {message.subject}
 
 Message:
-{message.message}
+{_truncate_message(message.message)}
 
 Date/Time: {message.datetime.strftime('%Y-%m-%d %H:%M:%S')}
 
-Determine both the category and urgency level of this message."""
\ No newline at end of file
+Determine both the category and urgency level of this message."""
+
+
+def eval_accuracy(labeled_messages: List[Tuple[Message, str, int]], api_key: str = "",
+                  models: Tuple[str, ...] = (DEFAULT_MODEL, ESCALATION_MODEL),
+                  max_concurrent: int = 20) -> Dict[str, Dict[str, float]]:
+    """Measure how well each model triages a labeled set of messages.
+    
+    Useful for checking that a smaller model still classifies a held-out
+    set as well as a larger one before switching to it.
+    
+    Args:
+        labeled_messages: List of (message, expected category, expected urgency level)
+        api_key: OpenAI API key (defaults to env var)
+        models: Chat models to evaluate
+        max_concurrent: Maximum number of concurrent API requests per model
+        
+    Returns:
+        Mapping of model name to the fraction of messages whose category,
+        urgency level, and both were classified as expected
+    """
+    messages = [message for message, _, _ in labeled_messages]
+    total = len(labeled_messages) or 1
+    
+    accuracy = {}
+    for model in models:
+        # The keyword fast path is off so every message is classified by the model
+        triager = MessageTriager(api_key=api_key, model=model, fast_path=False)
+        triaged_messages = triager.batch_triage_messages(messages, max_concurrent=max_concurrent)
+        
+        category_hits = urgency_hits = both_hits = 0
+        for triaged, (_, category, urgency_level) in zip(triaged_messages, labeled_messages):
+            category_ok = triaged.triage_category == category
+            urgency_ok = triaged.urgency_level == urgency_level
+            category_hits += category_ok
+            urgency_hits += urgency_ok
+            both_hits += category_ok and urgency_ok
+        
+        accuracy[model] = {
+            "category": category_hits / total,
+            "urgency_level": urgency_hits / total,
+            "both": both_hits / total,
+        }
+    
+    return accuracy
@@ -3,7 +3,7 @@ Utility functions for the HealthTriage application.
 """
 import os
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Union
 
 import pandas as pd
 import plotly.express as px
@@ -12,50 +12,72 @@ import streamlit as st
 
 from healthtriage.schemas import TriagedMessage
 
+# Maximum number of time buckets per category in the timeline chart
+TIMELINE_MAX_BUCKETS = 120
 
-def get_date_range_from_messages(messages: List[TriagedMessage]) -> Tuple[datetime, datetime]:
+# Number of distinct inputs each chart function keeps a cached figure for
+CHART_CACHE_ENTRIES = 8
+
+# Alert colors indexed by urgency level; index 0 is the default for unknown levels
+_ALERT_COLORS = (
+    "#95a5a6",
+    "#95a5a6",  # Gray for LOW
+    "#2ecc71",  # Green for ROUTINE
+    "#3498db",  # Blue for PRIORITY
+    "#f39c12",  # Orange for URGENT
+    "#e74c3c",  # Red for IMMEDIATE
+)
+
+
+def get_date_range_from_messages(messages: Union[List[TriagedMessage], pd.DataFrame]) -> Tuple[datetime, datetime]:
     """Get the minimum and maximum dates from a list of messages.
     
     Args:
-        messages: List of triaged messages
+        messages: List of triaged messages, or a DataFrame of triaged
+            messages with a ``datetime`` column
         
     Returns:
         Tuple of (min_date, max_date)
     """
-    if not messages:
+    if len(messages) == 0:
         # Default to last 30 days if no messages
         end_date = datetime.now()
         start_date = end_date - timedelta(days=30)
         return start_date, end_date
     
-    dates = [msg.datetime for msg in messages]
-    return min(dates), max(dates)
+    if isinstance(messages, pd.DataFrame):
+        dates = messages["datetime"]
+        return dates.min().to_pydatetime(), dates.max().to_pydatetime()
+    
+    # Track the running min and max in a single pass, without building a list of dates
+    it = iter(messages)
+    min_date = max_date = next(it).datetime
+    for msg in it:
+        date = msg.datetime
+        if date < min_date:
+            min_date = date
+        elif date > max_date:
+            max_date = date
+    return min_date, max_date
 
 
-def create_triage_summary_chart(messages: List[TriagedMessage]) -> go.Figure:
+@st.cache_data(show_spinner=False, max_entries=CHART_CACHE_ENTRIES)
+def create_triage_summary_chart(messages_df: pd.DataFrame) -> go.Figure:
     """Create a summary chart of triaged messages by category.
     
+    Figures are cached by the contents of ``messages_df``, so Streamlit
+    reruns that don't change the data reuse the previous figure.
+    
     Args:
-        messages: List of triaged messages
+        messages_df: DataFrame of triaged messages, one row per message
         
     Returns:
         Plotly figure object
     """
-    if not messages:
+    if messages_df.empty:
         # Return empty figure if no messages
         return go.Figure()
     
-    # Count messages by category and urgency level
-    data = []
-    for msg in messages:
-        data.append({
-            "Category": msg.triage_category,
-            "Urgency": msg.urgency_level,
-            "Count": 1
-        })
-    
-    df = pd.DataFrame(data)
-    
     # Get urgency labels for better display
     urgency_labels = {
         5: "5-IMMEDIATE",
@@ -65,11 +87,16 @@ def create_triage_summary_chart(messages: List[TriagedMessage]) -> go.Figure:
         1: "1-LOW"
     }
     
-    # Map urgency levels to labels
-    df["Urgency Label"] = df["Urgency"].map(urgency_labels)
+    # Store urgency as an ordered categorical so labels are a single rename of
+    # the categories rather than a lookup per row
+    df = pd.DataFrame({
+        "Category": messages_df["triage_category"],
+        "Urgency": pd.Categorical(messages_df["urgency_level"], categories=sorted(urgency_labels), ordered=True)
+    })
+    df["Urgency Label"] = df["Urgency"].cat.rename_categories(urgency_labels)
     
-    # Group by category and urgency
-    df_grouped = df.groupby(["Category", "Urgency", "Urgency Label"]).sum().reset_index()
+    # Count messages per category and urgency
+    df_grouped = df.groupby(["Category", "Urgency", "Urgency Label"], observed=True).size().reset_index(name="Count")
     
     # Sort by urgency in descending order
     df_grouped = df_grouped.sort_values("Urgency", ascending=False)
@@ -111,33 +138,35 @@ def create_triage_summary_chart(messages: List[TriagedMessage]) -> go.Figure:
     return fig
 
 
-def create_triage_timeline_chart(messages: List[TriagedMessage]) -> go.Figure:
+@st.cache_data(show_spinner=False, max_entries=CHART_CACHE_ENTRIES)
+def create_triage_timeline_chart(messages_df: pd.DataFrame) -> go.Figure:
     """Create a timeline chart of triaged messages by date.
     
+    Figures are cached by the contents of ``messages_df``, as for
+    create_triage_summary_chart.
+    
     Args:
-        messages: List of triaged messages
+        messages_df: DataFrame of triaged messages, one row per message
         
     Returns:
         Plotly figure object
     """
-    if not messages:
+    if messages_df.empty:
         # Return empty figure if no messages
         return go.Figure()
     
-    # Create DataFrame with date and category
-    data = []
-    for msg in messages:
-        data.append({
-            "Date": msg.datetime.date(),
-            "Category": msg.triage_category,
-            "Urgency": msg.urgency_level,
-            "Count": 1
-        })
+    # Bucket by day, or by week/month for long date ranges so the number of
+    # plotted points stays bounded
+    freq = get_timeline_frequency(messages_df["datetime"].min(), messages_df["datetime"].max())
     
-    df = pd.DataFrame(data)
+    # Create DataFrame with date bucket and category
+    df = pd.DataFrame({
+        "Date": messages_df["datetime"].dt.to_period(freq).dt.start_time,
+        "Category": messages_df["triage_category"]
+    })
     
-    # Group by date and category
-    df_grouped = df.groupby(["Date", "Category"]).sum().reset_index()
+    # Count messages per date bucket and category
+    df_grouped = df.groupby(["Date", "Category"]).size().reset_index(name="Count")
     
     # Get category colors
     # Use a distinct color for each category, separate from urgency colors
@@ -168,6 +197,27 @@ def create_triage_timeline_chart(messages: List[TriagedMessage]) -> go.Figure:
     return fig
 
 
+def get_timeline_frequency(start: datetime, end: datetime) -> str:
+    """Get the time bucket size for a timeline covering the given range.
+    
+    Picks the finest of daily, weekly or monthly buckets that keeps the
+    number of buckets within TIMELINE_MAX_BUCKETS.
+    
+    Args:
+        start: Earliest message datetime
+        end: Latest message datetime
+        
+    Returns:
+        Pandas period frequency ("D", "W" or "M")
+    """
+    days = (end - start).days + 1
+    if days <= TIMELINE_MAX_BUCKETS:
+        return "D"
+    if days / 7 <= TIMELINE_MAX_BUCKETS:
+        return "W"
+    return "M"
+
+
 def get_message_alert_color(urgency_level: int) -> str:
     """Get the alert color for a given urgency level.
     
@@ -177,15 +227,9 @@ def get_message_alert_color(urgency_level: int) -> str:
     Returns:
         CSS color string
     """
-    color_map = {
-        5: "#e74c3c",  # Red for IMMEDIATE
-        4: "#f39c12",  # Orange for URGENT
-        3: "#3498db",  # Blue for PRIORITY
-        2: "#2ecc71",  # Green for ROUTINE
-        1: "#95a5a6"   # Gray for LOW
-    }
-    
-    return color_map.get(urgency_level, "#95a5a6")
+    if 1 <= urgency_level <= 5:
+        return _ALERT_COLORS[urgency_level]
+    return _ALERT_COLORS[0]
 
 
 def format_datetime(dt: datetime) -> str: